@@ -0,0 +1,132 @@
+# ann_index.py
+import logging
+import math
+import os
+import time
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# "flat" keeps exact search; "ivf_flat" or "ivf_pq" is used once a corpus passes ANN_THRESHOLD
+ANN_INDEX_TYPE = os.getenv("ANN_INDEX_TYPE", "ivf_flat")
+ANN_THRESHOLD = int(os.getenv("ANN_THRESHOLD", "50000"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", "64"))
+# IVF centroids are retrained once the corpus is this many times the size they were trained on
+ANN_RETRAIN_GROWTH = float(os.getenv("ANN_RETRAIN_GROWTH", "2.0"))
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq")
+# FAISS wants roughly this many training points per IVF list
+MIN_POINTS_PER_LIST = 39
+MAX_TRAINING_POINTS = 100000
+
+
+def is_flat(index):
+    """Return True for exact (brute-force) FAISS indexes"""
+    return isinstance(index, faiss.IndexFlat)
+
+
+def describe(index):
+    """Return a short name for the type of a FAISS index"""
+    if is_flat(index):
+        return "flat"
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return type(index).__name__
+    if isinstance(ivf, faiss.IndexIVFPQ):
+        return f"ivf_pq(nlist={ivf.nlist}, m={ivf.pq.M}, nprobe={ivf.nprobe})"
+    return f"ivf_flat(nlist={ivf.nlist}, nprobe={ivf.nprobe})"
+
+
+def choose_nlist(n):
+    """Pick an IVF list count of about 4*sqrt(n), capped so every list can be trained"""
+    return max(1, min(int(4 * math.sqrt(n)), n // MIN_POINTS_PER_LIST))
+
+
+def choose_pq_m(dim, max_m=ANN_PQ_M):
+    """Largest number of PQ sub-quantizers <= max_m that divides the dimension"""
+    for m in range(min(max_m, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def build_index(vectors, index_type, nprobe=ANN_NPROBE):
+    """Build a FAISS L2 index of the given type over a float32 matrix"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, dim = vectors.shape
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+        index.add(vectors)
+        return index
+
+    nlist = choose_nlist(n)
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf_pq":
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, choose_pq_m(dim), 8)
+    else:
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+
+    training = vectors
+    if n > MAX_TRAINING_POINTS:
+        rng = np.random.default_rng(0)
+        training = vectors[rng.choice(n, MAX_TRAINING_POINTS, replace=False)]
+
+    start = time.perf_counter()
+    index.train(training)
+    index.add(vectors)
+    index.nprobe = min(nprobe, nlist)
+    logger.info("Built %s over %d vectors in %.1f s", describe(index), n, time.perf_counter() - start)
+    return index
+
+
+def maybe_compress(store, embeddings, trained_on=None, index_type=ANN_INDEX_TYPE, threshold=ANN_THRESHOLD,
+                   growth=ANN_RETRAIN_GROWTH):
+    """Swap a flat index for an IVF one once the corpus passes the threshold.
+
+    An IVF index trained on ``trained_on`` vectors is rebuilt once the
+    corpus grows ``growth`` times past that, since centroids trained on the
+    early documents fit later ones poorly and the lists grow unevenly.
+    Vector positions are preserved, so the store's docstore mapping stays
+    valid. Returns the number of vectors the IVF index is trained on, to be
+    passed back next time, or None while the index is flat.
+    """
+    index = store.index
+    if not is_flat(index):
+        if trained_on is None:
+            # Trained before the count was recorded; start counting from here
+            return index.ntotal
+        if index.ntotal < growth * trained_on:
+            return trained_on
+        logger.info("Retraining %s: %d vectors, trained on %d", describe(index), index.ntotal, trained_on)
+        decompress(store, embeddings)
+        index = store.index
+    if index_type == "flat" or index.ntotal < threshold:
+        return None
+    vectors = index.reconstruct_n(0, index.ntotal)
+    store.index = build_index(vectors, index_type)
+    return index.ntotal
+
+
+def decompress(store, embeddings):
+    """Replace an IVF index with an exact flat one, in the same vector order.
+
+    IVF indexes do not renumber vectors when ids are removed, which breaks
+    the positional docstore mapping LangChain relies on, so deletions go
+    through a flat index. Vectors are re-fetched through ``embeddings``
+    (normally served from the embedding cache) rather than decoded from
+    lossy PQ codes.
+    """
+    if is_flat(store.index):
+        return
+    texts = [store.docstore.search(store.index_to_docstore_id[i]).page_content
+             for i in range(store.index.ntotal)]
+    vectors = np.array(embeddings.embed_documents(texts), dtype="float32")
+    flat = faiss.IndexFlatL2(store.index.d)
+    if len(vectors):
+        flat.add(vectors)
+    store.index = flat
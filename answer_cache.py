@@ -0,0 +1,201 @@
+# answer_cache.py
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(".cache", "answers.sqlite3"))
+MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))
+# Cosine similarity above which a paraphrase reuses a cached answer; 0 disables semantic matching
+SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
+
+def normalize_question(question):
+    """Normalize a question so trivially different phrasings share a key"""
+    question = unicodedata.normalize("NFKC", question).lower()
+    question = re.sub(r"\s+", " ", question).strip()
+    return question.rstrip("?.!। ")
+
+
+class AnswerCache:
+    """Persistent cache of chat answers keyed by (question, document-set version, mode).
+
+    ``scope`` names the document set an answer was drawn from (an index
+    directory, or None for answers that do not use documents) and
+    ``version`` its current version stamp, so answers go stale as soon as
+    the documents change. Entries expire after ``ttl`` seconds and the least
+    recently used are evicted past ``max_entries``. When ``embed_fn`` and a
+    similarity threshold are given, a question that misses exactly can still
+    hit a cached paraphrase in the same scope, version and mode.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS,
+                 similarity_threshold=SIMILARITY_THRESHOLD, embed_fn=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "semantic_hits": 0, "misses": 0}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                scope TEXT NOT NULL,
+                version TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                vector BLOB,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_scope ON answers (scope, version, mode)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(question, scope, version, mode):
+        raw = "\x1f".join([normalize_question(question), scope, version, mode])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _semantic_enabled(self):
+        return self.embed_fn is not None and self.similarity_threshold > 0
+
+    def get(self, question, mode, scope=None, version=None):
+        """Return (answer, how) where how is "exact", "semantic" or None on a miss"""
+        scope, version = scope or "-", version or "-"
+        now = time.time()
+        key = self._key(question, scope, version, mode)
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer FROM answers WHERE key = ? AND created > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row:
+                self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self._stats["hits"] += 1
+                return row[0], "exact"
+
+        if self._semantic_enabled():
+            vector = np.asarray(self.embed_fn(normalize_question(question)), dtype="float32")
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT key, answer, vector FROM answers "
+                    "WHERE scope = ? AND version = ? AND mode = ? AND vector IS NOT NULL AND created > ?",
+                    (scope, version, mode, now - self.ttl),
+                ).fetchall()
+            if rows:
+                matrix = np.frombuffer(b"".join(r[2] for r in rows), dtype="float32").reshape(len(rows), -1)
+                norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(vector) or 1.0)
+                similarities = matrix @ vector / np.where(norms == 0, 1.0, norms)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    with self._lock:
+                        self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, rows[best][0]))
+                        self._conn.commit()
+                        self._stats["hits"] += 1
+                        self._stats["semantic_hits"] += 1
+                    return rows[best][1], "semantic"
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None, None
+
+    def put(self, question, answer, mode, scope=None, version=None):
+        """Store an answer and evict expired and least recently used entries"""
+        scope, version = scope or "-", version or "-"
+        now = time.time()
+        vector = None
+        if self._semantic_enabled():
+            vector = np.asarray(self.embed_fn(normalize_question(question)), dtype="float32").tobytes()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers "
+                "(key, scope, version, mode, question, answer, vector, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key(question, scope, version, mode), scope, version, mode,
+                 normalize_question(question), answer, vector, now, now),
+            )
+            self._conn.execute("DELETE FROM answers WHERE created <= ?", (now - self.ttl,))
+            count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE key IN "
+                    "(SELECT key FROM answers ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def get_or_compute(self, question, mode, compute, scope=None, version=None):
+        """Return (answer, how) from the cache, calling compute() and storing its result on a miss"""
+        answer, how = self.get(question, mode, scope, version)
+        if how:
+            return answer, how
+        answer = compute()
+        if answer:
+            self.put(question, answer, mode, scope, version)
+        return answer, None
+
+    def store_stream(self, question, chunks, mode, scope=None, version=None):
+        """Pass a stream of answer chunks through, caching the full answer once it completes"""
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        answer = "".join(parts).strip()
+        if answer:
+            self.put(question, answer, mode, scope, version)
+
+    def invalidate(self, scope, keep_version=None):
+        """Drop answers for a document set, except those for ``keep_version``"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM answers WHERE scope = ? AND version != ?", (scope, keep_version or "")
+            )
+            self._conn.commit()
+        if cursor.rowcount:
+            logger.info("Invalidated %d cached answers for %s", cursor.rowcount, scope)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else None
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """Return the answer cache shared by every session in this process"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            embed_fn = None
+            if SIMILARITY_THRESHOLD > 0:
+                from vector_store import get_embeddings
+                embed_fn = get_embeddings().embed_query
+            _cache = AnswerCache(embed_fn=embed_fn)
+        return _cache
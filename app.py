@@ -1,34 +1,66 @@
 import streamlit as st
-import phet_simulations
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 import os
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-import google.generativeai as genai
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains.question_answering import load_qa_chain
-from langchain.prompts import PromptTemplate
+import sys
 from dotenv import load_dotenv
-import speech_recognition as sr
-from gtts import gTTS
-import base64
-from io import BytesIO
-from langchain.memory import ConversationBufferMemory
-from PIL import Image
 import time
 import random
-from sinhala_chemistry_teacher import get_step_by_step_answer
-from mock_exams import show_mock_exams
+import uuid
+import logging
+
+
+@st.cache_resource
+def load_settings():
+    """Load .env once per process, before any project module reads its settings"""
+    load_dotenv()
+
+
+load_settings()
+
+# Feature modules and heavy dependencies (LangChain, FAISS, PyPDF2, PIL, speech_recognition,
+# plotly, torch) are imported where they are first used, so a cold start only pays for the chat
+from sinhala_chemistry_teacher import stream_step_by_step_answer
 # from iupac_nomenclature import load_iupac_model, get_iupac_response, translate_to_sinhala
-from smart_table import show_smart_table
-from guided_labs import show_guided_labs
-from image_processor import process_screenshot
+from vector_store import INDEX_DIR, registry, index_dir_for, migrate_legacy_index, read_index_version
+from answer_cache import get_answer_cache
+from conversation_memory import ConversationMemory, refers_back
+from chunker import split_text
+from context_packing import CONTEXT_CANDIDATES, pack_context
+import llm_gateway
+from tts import synthesize_clip, synthesize_segments
+import audio_assets
+import audio_player
+from audio_queue import get_prompt_queue
+from tts_cache import get_tts_cache
+from audio_bundle import get_audio_bundle
+import tracing
+from usage_ledger import get_usage_ledger, set_session
+
 
+logger = logging.getLogger(__name__)
 
-load_dotenv()
-os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# Messages kept for display in the chat tab
+MAX_CHAT_HISTORY = 100
+# Unlocks the usage and cost panel in the sidebar; the panel is hidden when unset
+ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "")
+# How often accessibility mode checks whether queued prompts have finished playing
+VOICE_POLL_SECONDS = float(os.getenv("VOICE_POLL_SECONDS", "0.5"))
+# Answer to a chat question when neither this session nor the shared namespace has an index
+NO_INDEX_MESSAGE = (
+    "කරුණාකර පළමුව ඔබගේ PDF ලේඛන උඩුගත කර සකසන්න. "
+    "(Please upload and process your PDF documents first.)"
+)
+# Sections of the visual interface; only the selected one runs on each rerun.
+# Keys are st.session_state.current_tab values, shared with voice navigation.
+SECTIONS = {
+    "Chat": "💬 Chat Assistant",
+    "Quizzes": "📝 Chemistry Quizzes",
+    "Simulations": "🧬 Molecular Explorer",
+    "Labs": "🔬 Virtual Labs",
+    "Exams": "📚 Mock Exams",
+    "IUPAC": "🧪 IUPAC Practice",
+    "Periodic Table": "🧪 Smart Periodic Table",
+    "Screenshot": "📸 Screenshot Solver",
+}
 
 # Initialize session states
 if 'listening' not in st.session_state:
@@ -49,32 +81,37 @@ if 'iupac_model' not in st.session_state:
     st.session_state.iupac_model = None
 if 'iupac_tokenizer' not in st.session_state:
     st.session_state.iupac_tokenizer = None
+if 'last_answer_cached' not in st.session_state:
+    st.session_state.last_answer_cached = False
+if 'conversation_memory' not in st.session_state:
+    st.session_state.conversation_memory = ConversationMemory()
+if 'session_namespace' not in st.session_state:
+    st.session_state.session_namespace = f"session-{uuid.uuid4().hex[:12]}"
+# Every rerun gets its own ID so its log lines can be told apart from other sessions'
+st.session_state.request_id = tracing.new_request_id()
+set_session(st.session_state.session_namespace)
 
 
 # ----------------- Enhanced Voice Functions -----------------
-def speak(text, language='si', wait=False):
-    """Convert text to speech and play it immediately"""
-    tts = gTTS(text=text, lang=language)
-    fp = BytesIO()
-    tts.write_to_fp(fp)
-    fp.seek(0)
-    
-    # Play audio
-    audio_bytes = fp.read()
-    b64 = base64.b64encode(audio_bytes).decode()
-    md = f"""
-        <audio autoplay {'controls' if not wait else ''}>
-        <source src="data:audio/mp3;base64,{b64}" type="audio/mp3">
-        </audio>
-        """
-    st.markdown(md, unsafe_allow_html=True)
-    
-    # Add delay if needed
-    if wait:
-        time.sleep(len(text.split()) * 0.3)  # Approximate speaking time
+def speak(text, language='si'):
+    """Queue text to be spoken on the student's page, starting as soon as the first sentence is ready.
+
+    Nothing waits for playback here; the voice flow checks the session's
+    prompt queue before its next step instead.
+    """
+    started = time.perf_counter()
+    # Segments are rendered by clip ID; the browser fetches the audio itself instead of over the websocket
+    for i, clip_id in enumerate(synthesize_segments(text, language, synthesize_fn=synthesize_clip)):
+        if i == 0:
+            tracing.observe("tts.first_audio", time.perf_counter() - started)
+        with tracing.span("tts.render"):
+            audio_player.enqueue(clip_id, st.session_state.session_namespace)
+    tracing.observe("tts.synthesize", time.perf_counter() - started)
 
 def transcribe_audio(timeout=10, max_retries=2):
     """Convert spoken Sinhala to text using Google's speech recognition with retry"""
+    import speech_recognition as sr
+
     r = sr.Recognizer()
     retry_count = 0
     
@@ -123,20 +160,26 @@ def describe_molecule(smiles):
     Respond in Sinhala.
     """
     
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    response = model.generate_content(prompt)
-    return response.text.strip()
+    return llm_gateway.generate_text(prompt, feature="molecule_description").strip()
 
 # ----------------- Navigation Functions for Blind Students -----------------
-def navigate_app():
+# The voice flow runs as a series of steps, one per tick of run_voice_flow. Each step queues
+# its prompts and returns the name of the next step, which only runs once the student's page
+# has played everything queued, so no server thread sleeps while audio plays.
+def section_step():
+    """First voice step of the current section"""
+    return {"Chat": "chat", "Quizzes": "quiz", "Simulations": "molecule"}.get(st.session_state.current_tab, "menu")
+
+def voice_menu():
     """Voice-based navigation system for blind students"""
     speak("Accessibility mode activated. You can now navigate by voice.", 'en')
-    time.sleep(1)
     speak("Say 'chat' for chemistry questions, 'quiz' for practice questions, 'molecules' for molecular visualizer, or 'help' for assistance.", 'en')
-    
+    return "command"
+
+def voice_command():
     command = transcribe_audio(timeout=8, max_retries=1)
     if not command:
-        return  # Return if no command was recognized
+        return "command"
         
     command = command.lower()
     
@@ -151,30 +194,204 @@ def navigate_app():
         speak("Opening molecular visualizer. Say a compound name like 'water' or 'benzene' to learn about its structure.", 'si')
     elif 'help' in command:
         speak("Available commands: 'chat', 'quiz', 'molecules', 'exit accessibility mode'.", 'en')
+        return "command"
     elif 'exit' in command or 'close' in command:
         st.session_state.accessibility_mode = False
         speak("Exiting accessibility mode.", 'en')
+        return "exit"
     else:
         speak("Command not recognized. Please try again.", 'en')
+        return "command"
+    return section_step()
+
+def voice_exit():
+    # The goodbye has played; bring back the visual interface
+    st.rerun()
+
+def voice_chat():
+    speak("You are in the chat tab. Ask a chemistry question.", 'si')
+    return "chat_question"
+
+def voice_chat_question():
+    user_question = transcribe_audio(timeout=15, max_retries=1)
+    if user_question:
+        response = process_question(user_question)
+        st.session_state.chat_history.append({"role": "user", "content": user_question})
+        st.session_state.chat_history.append({"role": "assistant", "content": response})
+        speak("Question answered. Say 'navigate' to go to another section.", 'en')
+    else:
+        speak("No question detected. Returning to navigation.", 'en')
+    return "menu"
+
+def voice_quiz():
+    speak("You are in the quizzes tab. Say 'generate quiz' to start.", 'si')
+    return "quiz_command"
+
+def voice_quiz_command():
+    command = transcribe_audio(timeout=8, max_retries=1)
+    if command and 'generate' in command.lower() and st.session_state.text_chunks:
+        try:
+            with st.spinner("Creating questions..."):
+                questions = generate_quiz_questions(st.session_state.text_chunks, num_questions=3)
+        except llm_gateway.BudgetExceeded:
+            speak(llm_gateway.BUDGET_MESSAGE, 'si')
+            return "menu"
+        st.session_state.voice_quiz = {"questions": questions, "index": 0, "score": 0}
+        speak("Quiz generated. I will ask you 3 questions.", 'si')
+        return "quiz_question"
+    speak("Quiz completed. Say 'navigate' to go to another section.", 'en')
+    return "menu"
+
+def parse_quiz_question(q_data):
+    """Split a 'Q:: question|A:: option|...' line into the question, its options and the correct answer"""
+    parts = q_data.split('|')
+    options = [p.split(':: ')[1] for p in parts[1:]]
+    return parts[0].replace('Q:: ', ''), options, options[0]
+
+def voice_quiz_question():
+    quiz = st.session_state.voice_quiz
+    question_text, options, _ = parse_quiz_question(quiz["questions"][quiz["index"]])
+    speak(f"Question {quiz['index'] + 1}: {question_text}", 'si')
+    speak("Options:", 'si')
+    for j, option in enumerate(options):
+        speak(f"{chr(65+j)}: {option}", 'si')
+    return "quiz_answer"
+
+def voice_quiz_answer():
+    quiz = st.session_state.voice_quiz
+    _, options, correct_answer = parse_quiz_question(quiz["questions"][quiz["index"]])
+    answer = transcribe_audio(timeout=12, max_retries=1)
+    
+    if answer and any(char in answer.upper() for char in ['A', 'B', 'C', 'D']):
+        selected_char = next((char for char in ['A', 'B', 'C', 'D'] if char in answer.upper()), '')
+        selected_index = ord(selected_char) - 65
+        selected_answer = options[selected_index] if 0 <= selected_index < len(options) else ""
+        
+        if selected_answer == correct_answer:
+            quiz["score"] += 1
+            speak("Correct! ✅", 'si')
+        else:
+            speak(f"Wrong. The correct answer is: {correct_answer} ❌", 'si')
+    else:
+        speak(f"Answer not recognized. The correct answer is: {correct_answer}", 'si')
+    
+    quiz["index"] += 1
+    if quiz["index"] < len(quiz["questions"]):
+        return "quiz_question"
+    
+    score, total = quiz["score"], len(quiz["questions"])
+    speak(f"You scored {score} out of {total}", 'si')
+    if score == total:
+        speak("Excellent work! 🎉", 'si')
+    elif score >= total/2:
+        speak("Good effort! 👍", 'si')
+    else:
+        speak("Keep practicing! You'll improve. 📚", 'si')
+    speak("Quiz completed. Say 'navigate' to go to another section.", 'en')
+    return "menu"
+
+def voice_molecule():
+    speak("Say the name of a chemical compound to learn about its structure.", 'si')
+    return "molecule_name"
+
+def voice_molecule_name():
+    compound_name = transcribe_audio(timeout=12, max_retries=1)
+    
+    if compound_name:
+        try:
+            speak(f"Processing {compound_name}...", 'en')
+            smiles = get_smiles_from_name(compound_name)
+            speak(f"The SMILES notation is: {smiles}", 'en')
+            
+            # Generate verbal description
+            description = describe_molecule(smiles)
+            speak(f"Description of {compound_name}:", 'en')
+            speak(description, 'si')
+            
+        except llm_gateway.BudgetExceeded:
+            speak(llm_gateway.BUDGET_MESSAGE, 'si')
+        except Exception as e:
+            speak(f"Error: {str(e)}. Try another name.", 'en')
+    
+    speak("Molecule described. Say 'navigate' to go to another section.", 'en')
+    return "menu"
+
+VOICE_STEPS = {
+    "menu": voice_menu,
+    "command": voice_command,
+    "exit": voice_exit,
+    "chat": voice_chat,
+    "chat_question": voice_chat_question,
+    "quiz": voice_quiz,
+    "quiz_command": voice_quiz_command,
+    "quiz_question": voice_quiz_question,
+    "quiz_answer": voice_quiz_answer,
+    "molecule": voice_molecule,
+    "molecule_name": voice_molecule_name,
+}
+
+@st.fragment(run_every=VOICE_POLL_SECONDS)
+def run_voice_flow():
+    """Run the next voice step once the student's page has played every queued prompt.
+
+    Ticks while audio is still playing return at once, so an accessibility
+    session only holds a server thread while a step does real work
+    (listening, answering).
+    """
+    audio_player.retain_queued(st.session_state.session_namespace)
+    if not get_prompt_queue(st.session_state.session_namespace).idle():
+        return
+    step = st.session_state.get("voice_step") or section_step()
+    with tracing.span(f"voice.{step}"):
+        st.session_state.voice_step = VOICE_STEPS[step]()
+
+def select_section():
+    st.session_state.current_tab = st.session_state.section
 
 # ----------------- Existing App Functions (Slightly Modified) -----------------
 def get_pdf_text(pdf_docs):
-    text = ""
-    for pdf in pdf_docs:
-        pdf_reader = PdfReader(pdf)
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-    return text
+    from pdf_pipeline import iter_pdf_pages
+
+    return "".join(text for _, _, text in iter_pdf_pages(pdf_docs))
 
 def get_text_chunks(text):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=1000)
-    chunks = text_splitter.split_text(text)
-    return chunks
+    return split_text(text)
+
+def current_index_dir():
+    """Index directory for this session, or for its class when a class code is set"""
+    class_code = st.session_state.get("class_code", "").strip()
+    if class_code:
+        return index_dir_for(f"class-{class_code}")
+    return index_dir_for(st.session_state.session_namespace)
+
+@st.cache_resource
+def migrate_indexes():
+    """Move the index saved before per-session namespaces into the shared one, once per process"""
+    migrate_legacy_index()
+
+def search_index_dir():
+    """Index to answer from: this session's own, or the shared one until the session processes documents"""
+    index_dir = current_index_dir()
+    if read_index_version(index_dir) is None and read_index_version(INDEX_DIR) is not None:
+        return INDEX_DIR
+    return index_dir
 
-def get_vector_store(text_chunks):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
-    vector_store.save_local("faiss_index")
+def get_vector_store(pdf_docs, progress=None):
+    """Update this session's index so it matches the uploaded PDFs, embedding only new chunks.
+
+    A class index is shared, so processing there only adds documents and
+    withdraws this session's own earlier uploads, never a classmate's.
+    """
+    from ingestion import ingest_documents
+    from pdf_pipeline import iter_pdf_pages, iter_page_chunks
+
+    return ingest_documents(
+        pdf_docs,
+        lambda docs: iter_page_chunks(iter_pdf_pages(docs), get_text_chunks),
+        index_dir=current_index_dir(),
+        progress=progress,
+        uploader=st.session_state.session_namespace if st.session_state.get("class_code", "").strip() else None
+    )
 
 def get_smiles_from_name(compound_name: str) -> str:
     prompt = f"""
@@ -189,10 +406,9 @@ def get_smiles_from_name(compound_name: str) -> str:
     SMILES: 
     """
     
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    response = model.generate_content(prompt)
-    return response.text.strip().split()[0]
+    return llm_gateway.generate_text(prompt, feature="smiles").strip().split()[0]
 
+@tracing.traced("molecule.render")
 def visualize_molecule(smiles: str):
     try:
         from rdkit import Chem
@@ -222,7 +438,6 @@ def generate_quiz_questions(text_chunks, num_questions=5):
     Text: {context}
     """
     
-    model = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7)
     questions = []
     
     random.shuffle(text_chunks)
@@ -230,15 +445,16 @@ def generate_quiz_questions(text_chunks, num_questions=5):
     
     for chunk in selected_chunks:
         prompt = quiz_prompt.format(num_questions=num_questions//3, context=chunk)
-        response = model.invoke([{"role": "user", "content": prompt}])
-        if response.content:
-            new_questions = [q.strip() for q in response.content.split('Q:: ') if q.strip()]
+        response = llm_gateway.generate_text(prompt, temperature=0.7, feature="quiz")
+        if response:
+            new_questions = [q.strip() for q in response.split('Q:: ') if q.strip()]
             questions.extend(f'Q:: {q}' for q in new_questions if '| A:: ' in q)
     
     random.shuffle(questions)
     return questions[:num_questions]
 
-def get_conversational_chain():
+@st.cache_resource
+def get_chat_prompt():
     prompt_template = """
     You are a helpful assistant that responds in Sinhala and specializes in chemistry. 
     - Always mention chemical compound names explicitly (e.g., "benzene" or "C₆H₆") when relevant.
@@ -257,36 +473,97 @@ def get_conversational_chain():
     Answer in Sinhala:
     """
 
-    model = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.3)
-    memory = ConversationBufferMemory(memory_key="chat_history", input_key="question")
-    
-    prompt = PromptTemplate(
+    from langchain.prompts import PromptTemplate
+
+    return PromptTemplate(
         template=prompt_template,
         input_variables=["context", "question", "chat_history"]
     )
+
+def timed_stream(chunks, timings):
+    """Pass a stream through, recording time to first token and total time in seconds"""
+    started = time.perf_counter()
+    for chunk in chunks:
+        if "first_token" not in timings:
+            timings["first_token"] = time.perf_counter() - started
+        yield chunk
+    timings["total"] = time.perf_counter() - started
+
+def stream_question(user_question):
+    """Yield the answer to a question from the uploaded documents as it is generated"""
+    index_dir = search_index_dir()
+    version = read_index_version(index_dir)
+    if version is None:
+        st.session_state.last_answer_cached = False
+        yield NO_INDEX_MESSAGE
+        return
+    cache = get_answer_cache()
+    
+    # A follow-up is only answered right with this conversation behind it, so it is neither looked up
+    # in nor added to the shared cache; a question that stands on its own is, even mid-conversation
+    chat_history = st.session_state.conversation_memory.render()
+    use_cache = not (chat_history and refers_back(user_question))
+    
+    cache_hit = False
+    if use_cache:
+        with tracing.span("chat.cache_lookup"):
+            cached, cache_hit = cache.get(user_question, "chat", scope=index_dir, version=version)
+    st.session_state.last_answer_cached = bool(cache_hit)
+    if cache_hit:
+        yield cached
+        return
     
-    chain = load_qa_chain(
-        model,
-        chain_type="stuff",
-        prompt=prompt,
-        memory=memory,
-        verbose=True
+    started = time.perf_counter()
+    try:
+        docs = registry.hybrid_search(user_question, k=CONTEXT_CANDIDATES, index_dir=index_dir)
+    except FileNotFoundError:
+        # Pruned or replaced between the version check and the search
+        yield NO_INDEX_MESSAGE
+        return
+    retrieval_ms = (time.perf_counter() - started) * 1000
+    tracing.observe("chat.retrieval", retrieval_ms / 1000)
+    with tracing.span("chat.packing"):
+        context, packing = pack_context(docs)
+    logger.info("Context for %r: retrieval %.1f ms + packing %.1f ms, %d candidates -> %d passages, "
+                "%d context tokens (old prompt ~%d)", user_question[:60], retrieval_ms, packing["pack_ms"],
+                packing["candidates"], packing["passages"], packing["context_tokens"], packing["baseline_tokens"])
+    prompt = get_chat_prompt().format(
+        context=context, question=user_question, chat_history=chat_history
     )
-    return chain
+    chunks = tracing.traced_stream(llm_gateway.stream(prompt, temperature=0.3, feature="chat"), "chat.generate")
+    if use_cache:
+        chunks = cache.store_stream(user_question, chunks, "chat", scope=index_dir, version=version)
+    try:
+        yield from chunks
+    except llm_gateway.BudgetExceeded:
+        # Not cached, so the question can be asked again once there is budget
+        yield llm_gateway.BUDGET_MESSAGE
 
+def stream_teacher_answer(user_question):
+    """Yield the Sinhala teacher-mode answer as it is generated"""
+    cache = get_answer_cache()
+    cached, cache_hit = cache.get(user_question, "teacher")
+    st.session_state.last_answer_cached = bool(cache_hit)
+    if cache_hit:
+        yield cached
+        return
+    chunks = tracing.traced_stream(stream_step_by_step_answer(user_question), "teacher.generate")
+    try:
+        yield from cache.store_stream(user_question, chunks, "teacher")
+    except llm_gateway.BudgetExceeded:
+        yield llm_gateway.BUDGET_MESSAGE
+
+def remember_exchange(user_question, answer):
+    """Add a finished exchange to the conversation memory; the budget and no-index notices are not answers"""
+    answer = answer.strip()
+    if answer and answer not in (llm_gateway.BUDGET_MESSAGE, NO_INDEX_MESSAGE):
+        st.session_state.conversation_memory.add_exchange(user_question, answer)
+
+@tracing.traced("chat.process_question")
 def process_question(user_question):
     """Process a question with enhanced accessibility features"""
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    new_db = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-    docs = new_db.similarity_search(user_question)
-    
-    chain = get_conversational_chain()
-    response = chain(
-        {"input_documents": docs, "question": user_question},
-        return_only_outputs=True
-    )
-    
-    response_text = response["output_text"]
+    response_text = "".join(stream_question(user_question)).strip()
+    remember_exchange(user_question, response_text)
     
     # Speak the response immediately for blind students
     if st.session_state.accessibility_mode:
@@ -324,6 +601,9 @@ def main():
     except Exception:
         pass
     
+    # Prompts still queued on the page from earlier runs must stay on the media endpoint
+    audio_player.retain_queued(st.session_state.session_namespace)
+    
     # Initialize session states
     if 'text_chunks' not in st.session_state:
         st.session_state.text_chunks = []
@@ -373,111 +653,31 @@ def main():
                 st.session_state.accessibility_mode = not st.session_state.accessibility_mode
                 if st.session_state.accessibility_mode:
                     st.session_state.retry_count = 0
+                    st.session_state.voice_step = None
                     st.rerun()
     
     # Skip rendering tabs in accessibility mode
     if st.session_state.accessibility_mode:
-        # Handle tab-specific functionality through voice commands
-        if st.session_state.current_tab == "Chat":
-            speak("You are in the chat tab. Ask a chemistry question.", 'si')
-            user_question = transcribe_audio(timeout=15, max_retries=1)
-            if user_question:
-                response = process_question(user_question)
-                st.session_state.chat_history.append({"role": "user", "content": user_question})
-                st.session_state.chat_history.append({"role": "assistant", "content": response})
-                # Return to navigation
-                speak("Question answered. Say 'navigate' to go to another section.", 'en')
-                time.sleep(1)
-                st.session_state.current_tab = "Chat"
-            else:
-                speak("No question detected. Returning to navigation.", 'en')
-            navigate_app()
-        
-        elif st.session_state.current_tab == "Quizzes":
-            speak("You are in the quizzes tab. Say 'generate quiz' to start.", 'si')
-            command = transcribe_audio(timeout=8, max_retries=1)
-            
-            if command and 'generate' in command.lower():
-                with st.spinner("Creating questions..."):
-                    if 'text_chunks' in st.session_state and st.session_state.text_chunks:
-                        questions = generate_quiz_questions(st.session_state.text_chunks, num_questions=3)
-                        speak("Quiz generated. I will ask you 3 questions.", 'si')
-                        
-                        score = 0
-                        for i, q_data in enumerate(questions):
-                            parts = q_data.split('|')
-                            question_text = parts[0].replace('Q:: ', '')
-                            options = [p.split(':: ')[1] for p in parts[1:]]
-                            
-                            speak(f"Question {i+1}: {question_text}", 'si')
-                            speak("Options:", 'si')
-                            for j, option in enumerate(options):
-                                speak(f"{chr(65+j)}: {option}", 'si')
-                            
-                            answer = transcribe_audio(timeout=12, max_retries=1)
-                            correct_answer = parts[1].split(':: ')[1]
-                            
-                            if answer and any(char in answer.upper() for char in ['A', 'B', 'C', 'D']):
-                                selected_char = next((char for char in ['A', 'B', 'C', 'D'] if char in answer.upper()), '')
-                                selected_index = ord(selected_char) - 65
-                                selected_answer = options[selected_index] if 0 <= selected_index < len(options) else ""
-                                
-                                if selected_answer == correct_answer:
-                                    score += 1
-                                    speak("Correct! ✅", 'si')
-                                else:
-                                    speak(f"Wrong. The correct answer is: {correct_answer} ❌", 'si')
-                            else:
-                                speak(f"Answer not recognized. The correct answer is: {correct_answer}", 'si')
-                        
-                        speak(f"You scored {score} out of {len(questions)}", 'si')
-                        if score == len(questions):
-                            speak("Excellent work! 🎉", 'si')
-                        elif score >= len(questions)/2:
-                            speak("Good effort! 👍", 'si')
-                        else:
-                            speak("Keep practicing! You'll improve. 📚", 'si')
-            
-            # Return to navigation
-            speak("Quiz completed. Say 'navigate' to go to another section.", 'en')
-            time.sleep(1)
-            navigate_app()
-        
-        elif st.session_state.current_tab == "Simulations":
-            speak("Say the name of a chemical compound to learn about its structure.", 'si')
-            compound_name = transcribe_audio(timeout=12, max_retries=1)
-            
-            if compound_name:
-                try:
-                    speak(f"Processing {compound_name}...", 'en')
-                    smiles = get_smiles_from_name(compound_name)
-                    speak(f"The SMILES notation is: {smiles}", 'en')
-                    
-                    # Generate verbal description
-                    description = describe_molecule(smiles)
-                    speak(f"Description of {compound_name}:", 'en')
-                    speak(description, 'si')
-                    
-                except Exception as e:
-                    speak(f"Error: {str(e)}. Try another name.", 'en')
-            
-            # Return to navigation
-            speak("Molecule described. Say 'navigate' to go to another section.", 'en')
-            time.sleep(1)
-            navigate_app()
-        
-        else:
-            # Start navigation
-            navigate_app()
-            st.rerun()
-        
+        run_voice_flow()
         return
     
     # ----------------- Modern Visual Interface -----------------
-    # Add tabs with icons
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs(["💬 Chat Assistant", "📝 Chemistry Quizzes", "🧬 Molecular Explorer", "🔬 Virtual Labs", "📚 Mock Exams","🧪 IUPAC Practice", "🧪 Smart Periodic Table","📸 Screenshot Solver"])
+    # st.tabs would run all eight section bodies on every rerun, so only the selected one is rendered.
+    # Setting current_tab and calling st.rerun() switches section, e.g. "Ask About This Element".
+    if st.session_state.current_tab not in SECTIONS:
+        st.session_state.current_tab = "Chat"
+    st.session_state.section = st.session_state.current_tab
+    section = st.radio(
+        "Section",
+        list(SECTIONS),
+        format_func=SECTIONS.get,
+        key="section",
+        horizontal=True,
+        label_visibility="collapsed",
+        on_change=select_section,
+    )
 
-    with tab1:
+    if section == "Chat":
         st.markdown("""
         <div class="card">
             <div class="card-title">
@@ -527,6 +727,11 @@ def main():
                             {message["content"]}
                         </div>
                         """, unsafe_allow_html=True)
+                        if message.get("cached"):
+                            st.caption(f"⚡ Instant answer from cache ({message['seconds'] * 1000:.0f} ms)")
+                        elif "seconds" in message:
+                            st.caption(f"⏱️ First token {message['first_token_seconds']:.1f} s · "
+                                       f"total {message['seconds']:.1f} s")
         
         with col2:
             st.markdown("""
@@ -583,21 +788,42 @@ def main():
         if user_question:
             st.session_state.chat_history.append({"role": "user", "content": user_question})
         
-            with st.spinner("ඔබගේ ප්‍රශ්නය විශ්ලේෂණය කරමින්..." if st.session_state.teacher_mode 
-                      else "Analyzing your question..."):
-                if st.session_state.teacher_mode:
-                # Use the new Sinhala teacher mode
-                    response = get_step_by_step_answer(user_question)
-                else:
-                # Existing PDF-based processing
-                    response = process_question(user_question)
-                
-            st.session_state.chat_history.append({"role": "assistant", "content": response})
+            if st.session_state.teacher_mode:
+            # Use the new Sinhala teacher mode
+                answer_stream = stream_teacher_answer(user_question)
+            else:
+            # Existing PDF-based processing
+                answer_stream = stream_question(user_question)
+            
+            # Render tokens into the chat as they arrive
+            timings = {}
+            with chat_container:
+                st.markdown(f"""
+                <div class="chat-message-user">
+                    <strong>You:</strong> {user_question}
+                </div>
+                """, unsafe_allow_html=True)
+                response = st.write_stream(timed_stream(answer_stream, timings))
+            
+            st.session_state.chat_history.append({
+                "role": "assistant",
+                "content": response,
+                "cached": st.session_state.last_answer_cached,
+                "first_token_seconds": timings.get("first_token", 0.0),
+                "seconds": timings.get("total", 0.0)
+            })
+            # Older turns live on in the conversation summary; only the display history is trimmed
+            del st.session_state.chat_history[:-MAX_CHAT_HISTORY]
+            logger.info("[%s] Chat answer: first token %.2f s, total %.2f s, cached=%s",
+                        st.session_state.request_id, timings.get("first_token", 0.0), timings.get("total", 0.0),
+                        st.session_state.last_answer_cached)
+            # Outside the timed stream; any summary it triggers is written in the background
+            remember_exchange(user_question, response)
             st.rerun()
 
     # ----------------- Chemistry Quizzes Tab -----------------
 
-    with tab2:
+    elif section == "Quizzes":
         st.markdown("""
         <div class="card">
             <div class="card-title">
@@ -623,19 +849,23 @@ def main():
                     if st.button("Create Quiz", use_container_width=True):
                         with st.spinner("Creating questions..."):
                             if 'text_chunks' in st.session_state and st.session_state.text_chunks:
-                                questions = generate_quiz_questions(st.session_state.text_chunks, num_questions=3)
-                                correct_answers = []
-                                for q in questions:
-                                    parts = q.split('|')
-                                    correct_answers.append(parts[1].split(':: ')[1])
-                                
-                                st.session_state.quiz = {
-                                    'questions': questions,
-                                    'correct_answers': correct_answers,
-                                    'user_answers': [None] * len(questions),
-                                    'submitted': False
-                                }
-                                st.success("Quiz created successfully!")
+                                try:
+                                    questions = generate_quiz_questions(st.session_state.text_chunks, num_questions=3)
+                                except llm_gateway.BudgetExceeded:
+                                    st.warning(llm_gateway.BUDGET_MESSAGE)
+                                else:
+                                    correct_answers = []
+                                    for q in questions:
+                                        parts = q.split('|')
+                                        correct_answers.append(parts[1].split(':: ')[1])
+                                    
+                                    st.session_state.quiz = {
+                                        'questions': questions,
+                                        'correct_answers': correct_answers,
+                                        'user_answers': [None] * len(questions),
+                                        'submitted': False
+                                    }
+                                    st.success("Quiz created successfully!")
                 
                 with col_info:
                     st.info("ℹ️ Quizzes are automatically generated based on chemistry topics. You can upload your own materials in the sidebar.")
@@ -751,7 +981,7 @@ def main():
             </div>
             """, unsafe_allow_html=True)
     
-    with tab3:
+    elif section == "Simulations":
         st.markdown("""
         <div class="card">
             <div class="card-title">
@@ -848,6 +1078,8 @@ def main():
                             
                             st.markdown("</div>", unsafe_allow_html=True)
                     
+                    except llm_gateway.BudgetExceeded:
+                        st.warning(llm_gateway.BUDGET_MESSAGE)
                     except Exception as e:
                         st.error(f"Error: {str(e)}. Try another name.")
             else:
@@ -861,16 +1093,18 @@ def main():
                     </div>
                     """, unsafe_allow_html=True)
     
-    with tab4:
+    elif section == "Labs":
         # Show PHET simulations or a placeholder if not implemented
         #phet_simulations.show_phet_simulations()
+        from guided_labs import show_guided_labs
         show_guided_labs()
         
-    with tab5:
+    elif section == "Exams":
+        from mock_exams import show_mock_exams
         show_mock_exams()
 
     
-    with tab6:
+    elif section == "IUPAC":
         st.markdown("""
         <div class="card">
             <div class="card-title">
@@ -940,13 +1174,16 @@ def main():
                         with st.expander("See English version"):
                             st.write(english_response)
                     
+                    except llm_gateway.BudgetExceeded:
+                        st.warning(llm_gateway.BUDGET_MESSAGE)
                     except Exception as e:
                         st.error(f"Error processing question: {str(e)}")
 
-    with tab7:
+    elif section == "Periodic Table":
+        from smart_table import show_smart_table
         show_smart_table()
 
-    with tab8:
+    elif section == "Screenshot":
         st.markdown("""
         <div class="card">
             <div class="card-title">
@@ -988,11 +1225,13 @@ def main():
             # Display uploaded image and process
             if uploaded_image is not None:
                 # Display the image
+                from PIL import Image
                 image = Image.open(uploaded_image)
                 st.image(image, caption="Uploaded Question", use_column_width=True)
             
                 # Process button
                 if st.button("🔍 Analyze and Solve", use_container_width=True):
+                    from image_processor import process_screenshot
                     answer = process_screenshot(image, screenshot_teacher_mode)
                 
                     # Display answer
@@ -1079,6 +1318,13 @@ def main():
             <p>Upload your chemistry materials for personalized learning</p>
         """, unsafe_allow_html=True)
         
+        st.text_input(
+            "Class code",
+            key="class_code",
+            placeholder="Optional: share materials with your class",
+            help="Students using the same class code share one set of processed documents"
+        )
+        
         pdf_docs = st.file_uploader(
             "Upload PDF files", 
             accept_multiple_files=True,
@@ -1089,18 +1335,107 @@ def main():
         if st.button("⚙️ Process Documents", use_container_width=True):
             with st.spinner("Processing..."):
                 if pdf_docs:
-                    raw_text = get_pdf_text(pdf_docs)
-                    text_chunks = get_text_chunks(raw_text)
-                    st.session_state.text_chunks = text_chunks
-                    get_vector_store(text_chunks)
-                    st.success("Documents processed successfully!")
-                    if st.session_state.accessibility_mode:
-                        speak("PDF processing complete. You can now ask questions about the documents.", 'en')
+                    progress_text = st.empty()
+                    try:
+                        summary = get_vector_store(pdf_docs, progress=progress_text.caption)
+                    except Exception as e:
+                        progress_text.empty()
+                        st.error(f"Processing stopped: {str(e)}. Finished batches were saved; "
+                                 "click Process Documents again to resume.")
+                        summary = None
+                    if summary:
+                        progress_text.empty()
+                        st.session_state.text_chunks = summary["chunks"]
+                        st.success("Documents processed successfully!")
+                        caption = (
+                            f"New: {summary['added_documents']} · Unchanged: {summary['skipped_documents']} · "
+                            f"Removed: {summary['removed_documents']} · Chunks embedded: {summary['embedded_chunks']}"
+                        )
+                        # No index is left when every document was removed
+                        if summary["index_type"]:
+                            caption += f" · Index: {summary['index_type']}"
+                        st.caption(caption)
+                        if st.session_state.accessibility_mode:
+                            speak("PDF processing complete. You can now ask questions about the documents.", 'en')
                 else:
                     st.warning("Please upload at least one PDF file")
         
         st.markdown("</div>", unsafe_allow_html=True)
         
+        # Retrieval latency from the shared index registry
+        index_stats = registry.stats()
+        # Embeddings are only loaded once documents are processed or searched; don't import them just for stats
+        embedding_cache = sys.modules.get("embedding_cache")
+        embedding_stats = embedding_cache.get_embedding_store().stats() if embedding_cache else {"hit_rate": None}
+        answer_stats = get_answer_cache().stats()
+        llm_stats = llm_gateway.stats()
+        tts_stats = get_tts_cache().stats()
+        bundle_stats = get_audio_bundle().stats()
+        stage_stats = tracing.snapshot()
+        if (index_stats["loads"] or embedding_stats["hit_rate"] is not None
+                or answer_stats["hit_rate"] is not None or tts_stats["hit_rate"] is not None
+                or llm_stats["calls"] or stage_stats):
+            with st.expander("⏱️ Retrieval Performance"):
+                if index_stats["loads"]:
+                    st.caption(f"Index loads: {index_stats['loads']} (avg {index_stats['avg_load_ms']:.0f} ms)")
+                    st.caption(f"Indexes in memory: {index_stats['resident']} · memory-mapped: {index_stats['mapped']} ({index_stats['mapped_mb']:.0f} MB)")
+                    st.caption(f"Loads avoided: {index_stats['hits']} (~{index_stats['saved_ms'] / 1000:.1f} s saved)")
+                if index_stats["searches"]:
+                    st.caption(f"Searches: {index_stats['searches']} (avg {index_stats['avg_search_ms']:.1f} ms)")
+                if index_stats["lexical_searches"]:
+                    st.caption(f"BM25 searches: {index_stats['lexical_searches']} "
+                               f"(avg {index_stats['avg_lexical_ms']:.1f} ms) · "
+                               f"answered lexically: {index_stats['lexical_only']}")
+                if answer_stats["hit_rate"] is not None:
+                    st.caption(f"Answer cache: {answer_stats['hit_rate']:.0%} hit rate "
+                               f"({answer_stats['semantic_hits']} paraphrase hits)")
+                if embedding_stats["hit_rate"] is not None:
+                    st.caption(f"Embedding cache: {embedding_stats['hit_rate']:.0%} hit rate "
+                               f"({embedding_stats['hits']} hits, {embedding_stats['misses']} misses, "
+                               f"{embedding_stats['entries']} stored)")
+                if tts_stats["hit_rate"] is not None:
+                    st.caption(f"Speech cache: {tts_stats['hit_rate']:.0%} hit rate "
+                               f"({tts_stats['hot_hits']} from memory, {tts_stats['disk_hits']} from disk, "
+                               f"{tts_stats['misses']} synthesized) · ~{tts_stats['saved_ms'] / 1000:.1f} s saved")
+                    if bundle_stats["version"]:
+                        st.caption(f"Audio bundle {bundle_stats['version']}: {bundle_stats['hits']} prebuilt clips used, "
+                                   f"{bundle_stats['misses']} synthesized live")
+                if llm_stats["calls"]:
+                    st.caption(f"Gemini calls: {llm_stats['calls']} (avg {llm_stats['avg_ms']:.0f} ms, "
+                               f"queued {llm_stats['avg_queued_ms']:.0f} ms) · retries: {llm_stats['retries']} · "
+                               f"errors: {llm_stats['errors']} · tokens: "
+                               f"{llm_stats['prompt_tokens'] + llm_stats['output_tokens']:,} "
+                               f"(~${llm_stats['cost']:.4f})")
+                slowest = sorted(stage_stats.items(), key=lambda item: item[1]["p95"], reverse=True)[:5]
+                for stage, summary in slowest:
+                    st.caption(f"{stage}: p50 ≤ {summary['p50'] * 1000:.0f} ms · "
+                               f"p95 ≤ {summary['p95'] * 1000:.0f} ms ({summary['count']} runs)")
+        
+        # Token and cost accounting for whoever runs the deployment
+        if ADMIN_PASSWORD:
+            with st.expander("🧾 Usage & Cost (admin)"):
+                if st.text_input("Admin password", type="password", key="admin_password") == ADMIN_PASSWORD:
+                    ledger = get_usage_ledger()
+                    today = time.strftime("%Y-%m-%d", time.gmtime())
+                    by_day = ledger.totals("day")
+                    today_totals = next((row for row in by_day if row["day"] == today), None)
+                    if today_totals:
+                        st.caption(f"Today: {today_totals['calls']} calls · "
+                                   f"{today_totals['prompt_tokens'] + today_totals['output_tokens']:,} tokens · "
+                                   f"${today_totals['cost_usd']:.4f}")
+                    if ledger.daily_budget:
+                        st.caption(f"Daily budget: ${ledger.daily_budget:.2f}")
+                    if ledger.session_budget:
+                        st.caption(f"Session budget: {ledger.session_budget:,} tokens")
+                    st.markdown("**By feature (today)**")
+                    st.dataframe(ledger.totals("feature", day=today), use_container_width=True, hide_index=True)
+                    st.markdown("**By session (today)**")
+                    st.dataframe(ledger.totals("session", day=today)[:20], use_container_width=True, hide_index=True)
+                    st.markdown("**By day**")
+                    st.dataframe(by_day[:30], use_container_width=True, hide_index=True)
+                    st.download_button("⬇️ Export CSV", ledger.export_csv(), file_name="llm_usage.csv",
+                                       mime="text/csv", use_container_width=True)
+        
         # Recent Activity
         st.markdown("""
         <div class="card">
@@ -1158,4 +1493,8 @@ def main():
         """, unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    tracing.start_exporters()
+    audio_assets.start_server()
+    migrate_indexes()
+    with tracing.span("rerun"):
+        main()
\ No newline at end of file
@@ -0,0 +1,154 @@
+# audio_assets.py
+import base64
+import logging
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+
+import audio_queue
+from tts import load_clip
+
+logger = logging.getLogger(__name__)
+
+# Public URL of the clip endpoint when it sits behind a proxy or HTTPS, e.g. https://chem.example.org/audio-clips
+AUDIO_BASE_URL = os.getenv("AUDIO_BASE_URL", "").rstrip("/")
+# Port serving synthesized clips at /audio/<clip id>.mp3 and playback signals at /played/...; off unless
+# AUDIO_BASE_URL routes to it or it is set explicitly (then reached on the app's host, for local use).
+# While it is off, clips are served from Streamlit's own media endpoint and playback ends are estimated
+# from clip durations
+AUDIO_PORT = int(os.getenv("AUDIO_PORT", "8502" if AUDIO_BASE_URL else "0"))
+
+CLIP_PATH = re.compile(r"/audio/([0-9a-f]{64})\.mp3")
+# Pinged by the page's player when a queued clip finishes, with its prompt queue's token (see audio_queue)
+PLAYED_PATH = re.compile(r"/played/([\w-]{1,64})/(\d+)")
+RANGE_HEADER = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class _AudioHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        played = PLAYED_PATH.fullmatch(self.path.split("?", 1)[0])
+        if played:
+            audio_queue.ack(played.group(1), int(played.group(2)))
+            # The player fetches in no-cors mode and never reads the response, so no CORS header is sent
+            self.send_response(204)
+            self.end_headers()
+            return
+
+        match = CLIP_PATH.fullmatch(self.path.split("?", 1)[0])
+        audio = load_clip(match.group(1)) if match else None
+        if audio is None:
+            self.send_error(404)
+            return
+
+        # Safari only plays audio from servers that honour byte ranges
+        start, end = 0, len(audio) - 1
+        requested = RANGE_HEADER.fullmatch(self.headers.get("Range", "").strip())
+        if requested and any(requested.groups()):
+            first, last = requested.groups()
+            if first:
+                start, end = int(first), min(int(last), end) if last else end
+            else:
+                start = max(0, len(audio) - int(last))
+            if start > end:
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(audio)}")
+        else:
+            self.send_response(200)
+        body = audio[start:end + 1]
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        # Clip IDs are content addresses, so a URL always names the same audio
+        self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_serving = None
+_server_lock = threading.Lock()
+
+
+def start_server():
+    """Start the clip endpoint once per process; returns whether clips are being served by URL"""
+    global _serving
+    with _server_lock:
+        if _serving is not None:
+            return _serving
+        _serving = False
+        if AUDIO_PORT:
+            try:
+                server = ThreadingHTTPServer(("0.0.0.0", AUDIO_PORT), _AudioHandler)
+            except OSError as e:
+                logger.warning("Audio endpoint not started on port %d, inlining clips instead: %s", AUDIO_PORT, e)
+            else:
+                threading.Thread(target=server.serve_forever, daemon=True, name="audio-http").start()
+                logger.info("Serving synthesized audio on :%d/audio", AUDIO_PORT)
+                _serving = True
+        return _serving
+
+
+def _base_url():
+    if AUDIO_BASE_URL:
+        return AUDIO_BASE_URL
+    try:
+        host = st.context.headers.get("Host") or "localhost"
+    except Exception:
+        host = "localhost"
+    hostname = host.rsplit(":", 1)[0] if not host.endswith("]") else host
+    return f"http://{hostname}:{AUDIO_PORT}"
+
+
+def _media_url(clip_id, audio):
+    """Register a clip with Streamlit's media endpoint, the one st.audio uses; None outside a running app"""
+    from streamlit import runtime
+
+    if not runtime.exists():
+        return None
+    # One entry per clip, so re-registering a clip refreshes it rather than adding a copy
+    url = runtime.get_instance().media_file_mgr.add(audio, "audio/mpeg", f"audio_clip.{clip_id}")
+    # Relative, so the page resolves it under the app's own scheme, host and base path
+    return url.lstrip("/")
+
+
+def url_for(clip_id):
+    """URL the browser can play a clip from, or None if the clip is no longer cached.
+
+    Relative URLs are relative to the app page. The data URI fallback is
+    only used when no Streamlit runtime is running.
+    """
+    if start_server():
+        return f"{_base_url()}/audio/{clip_id}.mp3"
+    audio = load_clip(clip_id)
+    if audio is None:
+        return None
+    return _media_url(clip_id, audio) or f"data:audio/mp3;base64,{base64.b64encode(audio).decode()}"
+
+
+def retain(clip_ids):
+    """Keep clips that are still queued on a page registered with the media endpoint.
+
+    Streamlit drops media files that the latest full script run did not
+    register, and queued prompts can outlive the run that queued them.
+    """
+    if start_server():
+        return
+    for clip_id in clip_ids:
+        audio = load_clip(clip_id)
+        if audio is not None:
+            _media_url(clip_id, audio)
+
+
+def played_url(queue, seq):
+    """URL the page's player requests once clip ``seq`` of a prompt queue has played, or None without the endpoint"""
+    if start_server():
+        return f"{_base_url()}/played/{queue.token}/{seq}"
+    return None
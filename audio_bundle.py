@@ -0,0 +1,189 @@
+# audio_bundle.py
+"""Prebuilt speech for the app's fixed prompts and element descriptions.
+
+The bundle is a zip of MP3 clips named by their TTS clip key (see
+tts_cache.clip_key) plus a manifest.json with its version. tts consults it
+before the TTS cache, so bundled clips are served straight from the zip and
+only dynamic text such as LLM answers needs a live gTTS call. Build it whenever prompts, data.json or the voice change:
+
+    python -m audio_bundle [--out assets/audio_bundle.zip] [--workers 4]
+
+Clips already in the previous bundle or the TTS cache are reused, so a
+rebuild only synthesizes new text.
+"""
+import argparse
+import ast
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_PATH = os.getenv("AUDIO_BUNDLE_PATH", os.path.join("assets", "audio_bundle.zip"))
+MANIFEST = "manifest.json"
+# Sizes of the voice quiz, for "You scored {score} out of {total}"
+VOICE_QUIZ_SIZES = (3,)
+
+
+class AudioBundle:
+    """Read-only clips from a bundle zip; the zip is opened on the first lookup"""
+
+    def __init__(self, path=BUNDLE_PATH):
+        self.path = path
+        self._zip = None
+        self._names = None
+        self.manifest = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def _open(self):
+        if self._names is None:
+            self._names = set()
+            if os.path.exists(self.path):
+                try:
+                    self._zip = zipfile.ZipFile(self.path)
+                    self.manifest = json.loads(self._zip.read(MANIFEST))
+                    self._names = set(self._zip.namelist())
+                    logger.info("Loaded audio bundle %s (version %s, %d clips)",
+                                self.path, self.manifest.get("version"), len(self._names) - 1)
+                except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+                    logger.warning("Ignoring unreadable audio bundle %s: %s", self.path, e)
+                    self._zip, self._names = None, set()
+
+    def has(self, key):
+        """Whether the bundle holds a clip key; counted as a lookup"""
+        with self._lock:
+            self._open()
+            found = f"{key}.mp3" in self._names
+            self._stats["hits" if found else "misses"] += 1
+            return found
+
+    def get(self, key):
+        """Return the prebuilt MP3 for a clip key, or None"""
+        return self.load(key) if self.has(key) else None
+
+    def load(self, key):
+        """Return the MP3 for a clip key without counting a lookup, for serving clips by ID"""
+        with self._lock:
+            self._open()
+            name = f"{key}.mp3"
+            return self._zip.read(name) if name in self._names else None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["version"] = self.manifest.get("version")
+        return stats
+
+
+_bundle = None
+_bundle_lock = threading.Lock()
+
+
+def get_audio_bundle():
+    """Return the audio bundle shared by every session in this process"""
+    global _bundle
+    with _bundle_lock:
+        if _bundle is None:
+            _bundle = AudioBundle()
+        return _bundle
+
+
+def app_prompts(path="app.py"):
+    """(text, language) of every speak() call in app.py whose text is a string literal"""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and getattr(node.func, "id", None) == "speak" and node.args):
+            continue
+        text = node.args[0]
+        language = node.args[1] if len(node.args) > 1 else None
+        if isinstance(text, ast.Constant) and isinstance(text.value, str):
+            yield text.value, language.value if isinstance(language, ast.Constant) else "si"
+
+
+def fixed_clips():
+    """Every clip the app can play that does not depend on the student or the LLM, as (text, language)"""
+    from smart_table import describe_element, load_element_data
+    from tts import split_sentences
+
+    prompts = list(app_prompts())
+    for total in VOICE_QUIZ_SIZES:
+        prompts += [(f"You scored {score} out of {total}", "si") for score in range(total + 1)]
+
+    # app.speak plays text sentence by sentence, so its clips are the segments
+    clips = [(segment, language) for text, language in prompts for segment in split_sentences(text)]
+    # smart_table.speak plays an element description as one clip
+    clips += [(describe_element(element), "en") for element in load_element_data()]
+    return list(dict.fromkeys(clips))
+
+
+def build(out=BUNDLE_PATH, workers=4):
+    """Synthesize every fixed clip into a new bundle at ``out`` and return its manifest"""
+    import tts
+    from tts_cache import clip_key, get_tts_cache
+
+    clips = fixed_clips()
+    previous = AudioBundle(out)
+    cache = get_tts_cache()
+    started = time.perf_counter()
+
+    def render(clip):
+        text, language = clip
+        key = clip_key(text, language, tts.TTS_BACKEND)
+        # Read from the TTS cache but not written to it, since the bundle will hold the clip
+        audio = previous.get(key) or cache.load(key) or tts.synthesize_live(text, language)
+        return key, text, language, audio
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rendered = list(pool.map(render, clips))
+
+    keys = sorted(key for key, _, _, _ in rendered)
+    manifest = {
+        "version": hashlib.sha256("\n".join(keys).encode()).hexdigest()[:12],
+        "voice": tts.TTS_BACKEND,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "clips": {key: {"text": text, "language": language, "bytes": len(audio)}
+                  for key, text, language, audio in rendered},
+    }
+
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    tmp_path = out + ".tmp"
+    # MP3 does not compress further, so clips are stored as they are
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED) as bundle:
+        bundle.writestr(MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=1))
+        for key, _, _, audio in rendered:
+            bundle.writestr(f"{key}.mp3", audio)
+    os.replace(tmp_path, out)
+
+    reused = previous.stats()["hits"]
+    logger.info("Built %s: %d clips, %.1f MB, %d reused from the previous bundle, %.0f s",
+                out, len(rendered), sum(len(a) for *_, a in rendered) / 1e6, reused,
+                time.perf_counter() - started)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render fixed prompts and element descriptions to speech")
+    parser.add_argument("--out", default=BUNDLE_PATH, help="Bundle file to write")
+    parser.add_argument("--workers", type=int, default=4, help="Clips synthesized at once")
+    parser.add_argument("--list", action="store_true", help="Only print the clips that would be built")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.list:
+        for text, language in fixed_clips():
+            print(f"[{language}] {text}")
+        return
+    manifest = build(args.out, args.workers)
+    print(f"{args.out}: version {manifest['version']}, {len(manifest['clips'])} clips, voice {manifest['voice']}")
+
+
+if __name__ == "__main__":
+    main()
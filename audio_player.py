@@ -0,0 +1,91 @@
+# audio_player.py
+import json
+
+import streamlit as st
+
+import audio_assets
+from audio_queue import get_prompt_queue, mp3_duration
+from tts import load_clip
+
+# Installed once on the app page (outside the component iframe, so playback survives reruns);
+# clips pushed to it play one after another in the order they were queued, and each clip's
+# "played" URL is requested when it ends so the server knows the student has heard it
+_PLAYER_JS = """
+window.chemAudioQueue = (function () {
+    const clips = [];
+    let playing = false;
+    function next() {
+        const clip = clips.shift();
+        if (clip === undefined) {
+            playing = false;
+            return;
+        }
+        playing = true;
+        const audio = new Audio(clip.src);
+        let finished = false;
+        function done() {
+            if (finished) return;
+            finished = true;
+            if (clip.played) fetch(clip.played, {mode: "no-cors"}).catch(function () {});
+            next();
+        }
+        audio.onended = done;
+        audio.onerror = done;
+        audio.play().catch(done);
+    }
+    return {
+        push: function (src, played) {
+            clips.push({src: src, played: played});
+            if (!playing) next();
+        }
+    };
+})();
+"""
+
+# ``player`` is the script above for a session's first clip and null afterwards; a page that
+# somehow lacks the queue still plays the clip, just without ordering
+_ENQUEUE_HTML = """
+<script>
+const page = window.parent;
+const player = {player};
+if (!page.chemAudioQueue && player) {{
+    const script = page.document.createElement("script");
+    script.textContent = player;
+    page.document.head.appendChild(script);
+}}
+const src = new URL({src}, page.location.href).href;
+if (page.chemAudioQueue) {{
+    page.chemAudioQueue.push(src, {played});
+}} else {{
+    new Audio(src).play().catch(function () {{}});
+}}
+</script>
+"""
+
+
+def enqueue(clip_id, session_id):
+    """Queue a clip to play on the student's page after any clips already queued.
+
+    The clip is also recorded on the session's prompt queue, which tells the
+    voice flow when the student has heard everything queued so far.
+    """
+    audio = load_clip(clip_id)
+    src = audio_assets.url_for(clip_id)
+    if audio is None or src is None:
+        return
+    duration = mp3_duration(audio) or 0.0
+    queue = get_prompt_queue(session_id)
+    seq = queue.push(duration, clip_id)
+    played = audio_assets.played_url(queue, seq)
+    # A page load starts a new session, so the player is sent with the first clip of each session only
+    player = None if st.session_state.get("audio_player_sent") else _PLAYER_JS
+    st.components.v1.html(
+        _ENQUEUE_HTML.format(player=json.dumps(player), src=json.dumps(src), played=json.dumps(played)),
+        height=0,
+    )
+    st.session_state.audio_player_sent = True
+
+
+def retain_queued(session_id):
+    """Keep the clips a session's page still has queued available; call once per script run"""
+    audio_assets.retain(get_prompt_queue(session_id).pending_clips())
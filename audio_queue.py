@@ -0,0 +1,111 @@
+# audio_queue.py
+import os
+import secrets
+import threading
+import time
+
+# Seconds past a clip's estimated end before a missing "played" signal from the page is given up on
+PLAYBACK_GRACE = float(os.getenv("PLAYBACK_GRACE", "1.5"))
+# Queues untouched for this long belong to closed sessions and are dropped
+QUEUE_TTL = float(os.getenv("PROMPT_QUEUE_TTL", "3600"))
+
+# kbps by bitrate index for Layer III, keyed by the MPEG version bits of the frame header
+_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),  # MPEG-1
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),  # MPEG-2
+    0: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),  # MPEG-2.5
+}
+
+
+def mp3_duration(audio):
+    """Seconds of audio in a constant-bitrate MP3 such as gTTS output, or None if it has no Layer III frame"""
+    start = 0
+    if audio[:3] == b"ID3" and len(audio) >= 10:
+        start = 10 + ((audio[6] & 0x7F) << 21 | (audio[7] & 0x7F) << 14 | (audio[8] & 0x7F) << 7 | audio[9] & 0x7F)
+    sync = audio.find(b"\xff", start)
+    while sync != -1 and sync + 2 < len(audio):
+        b1, b2 = audio[sync + 1], audio[sync + 2]
+        version, layer, index = (b1 >> 3) & 0x3, (b1 >> 1) & 0x3, b2 >> 4
+        if b1 & 0xE0 == 0xE0 and layer == 1 and version in _BITRATES and 0 < index < 15:
+            return (len(audio) - sync) * 8 / (_BITRATES[version][index] * 1000)
+        sync = audio.find(b"\xff", sync + 1)
+    return None
+
+
+class PromptQueue:
+    """Prompts queued on one student's page, and how far its playback has got.
+
+    Every clip pushed gets a sequence number; the page reports each number
+    back once the clip has finished playing (see audio_assets), under the
+    queue's random ``token`` so no other client can speak for it. The queue
+    also tracks when playback should end from the clips' durations, so a
+    page that cannot report back (autoplay blocked, endpoint disabled) holds
+    the flow up for at most PLAYBACK_GRACE seconds longer than the audio.
+    """
+
+    def __init__(self):
+        self.queued = 0
+        self.played = 0
+        self.ends_at = 0.0
+        self.last_used = time.monotonic()
+        self.token = secrets.token_urlsafe(24)
+        # (seq, clip_id, estimated end) of clips that may not have played yet
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def push(self, duration, clip_id=None):
+        """Record a clip of ``duration`` seconds queued after the others; returns its sequence number"""
+        with self._lock:
+            now = time.monotonic()
+            self.queued += 1
+            self.ends_at = max(now, self.ends_at) + duration
+            self.last_used = now
+            if clip_id is not None:
+                self._pending.append((self.queued, clip_id, self.ends_at))
+            return self.queued
+
+    def pending_clips(self):
+        """IDs of queued clips that have not been played, nor should have been by now"""
+        with self._lock:
+            now = time.monotonic()
+            self._pending = [(seq, clip_id, ends) for seq, clip_id, ends in self._pending
+                             if seq > self.played and now < ends + PLAYBACK_GRACE]
+            return [clip_id for _, clip_id, _ in self._pending]
+
+    def ack(self, seq):
+        """The page finished playing every clip up to ``seq``"""
+        with self._lock:
+            self.played = max(self.played, min(seq, self.queued))
+            self.last_used = time.monotonic()
+
+    def idle(self):
+        """True once everything queued has been played, or should have been"""
+        with self._lock:
+            return self.played >= self.queued or time.monotonic() >= self.ends_at + PLAYBACK_GRACE
+
+
+_queues = {}
+# The same queues by token, for "played" signals from pages
+_by_token = {}
+_queues_lock = threading.Lock()
+
+
+def get_prompt_queue(session_id):
+    """Return the prompt queue of a session, creating it on first use"""
+    with _queues_lock:
+        queue = _queues.get(session_id)
+        if queue is None:
+            now = time.monotonic()
+            for stale in [k for k, q in _queues.items() if now - q.last_used > QUEUE_TTL]:
+                del _by_token[_queues.pop(stale).token]
+            queue = _queues[session_id] = PromptQueue()
+            _by_token[queue.token] = queue
+        return queue
+
+
+def ack(token, seq):
+    """Record a "played" signal from a page; signals with unknown tokens are ignored"""
+    with _queues_lock:
+        queue = _by_token.get(token)
+    if queue is not None:
+        queue.ack(seq)
@@ -0,0 +1,100 @@
+# benchmarks/ann_index.py
+"""Compare flat, IVF-Flat and IVF-PQ indexes on a synthetic corpus.
+
+Reports recall@k against exact search, single-query latency, on-disk size
+and the resident memory added by loading each index memory-mapped.
+
+Usage (from the repository root):
+    python -m benchmarks.ann_index [--n 200000] [--dim 768] [--k 4] [--queries 500]
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from ann_index import INDEX_TYPES, build_index, describe
+
+
+def synthetic_corpus(n, dim, clusters, seed=0):
+    """Clustered Gaussian vectors, roughly like topic-grouped chunk embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.3 * rng.normal(size=(n, dim)).astype("float32")
+    return vectors.astype("float32")
+
+
+def rss_mb():
+    """Current resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        # Peak RSS is the best portable fallback (kilobytes on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def recall_at_k(found, truth, k):
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=200000, help="Corpus size")
+    parser.add_argument("--dim", type=int, default=768, help="Vector dimension")
+    parser.add_argument("--k", type=int, default=4, help="Neighbours per query")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries")
+    parser.add_argument("--clusters", type=int, default=500, help="Topic clusters in the corpus")
+    args = parser.parse_args()
+
+    print(f"Synthetic corpus: {args.n} x {args.dim}, {args.queries} queries, k={args.k}\n")
+    vectors = synthetic_corpus(args.n, args.dim, args.clusters)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(args.n, args.queries, replace=False)]
+    queries = queries + 0.1 * rng.normal(size=queries.shape).astype("float32")
+
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+    del exact
+
+    print(f"{'mode':<40} {'build s':>8} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7} {'disk MB':>8} {'RSS MB':>7}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for index_type in INDEX_TYPES:
+            start = time.perf_counter()
+            index = build_index(vectors, index_type)
+            build_seconds = time.perf_counter() - start
+
+            path = os.path.join(tmp_dir, f"{index_type}.faiss")
+            faiss.write_index(index, path)
+            del index
+
+            # Load the way the registry does for cold namespaces
+            before = rss_mb()
+            try:
+                index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                index = faiss.read_index(path)
+
+            latencies = []
+            found = []
+            for query in queries:
+                start = time.perf_counter()
+                _, ids = index.search(query.reshape(1, -1), args.k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                found.append(ids[0])
+            resident = rss_mb() - before
+
+            print(f"{describe(index):<40} {build_seconds:8.1f} {recall_at_k(found, truth, args.k):7.3f} "
+                  f"{np.percentile(latencies, 50):7.2f} {np.percentile(latencies, 95):7.2f} "
+                  f"{os.path.getsize(path) / 1e6:8.1f} {resident:7.1f}")
+            del index
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/audio_payload.py
+"""Measure how much audio travels over the Streamlit websocket and sits in session state.
+
+Drives the app through streamlit.testing's AppTest in its default
+configuration (no AUDIO_PORT or AUDIO_BASE_URL), the way a fresh deployment
+runs it:
+
+- Periodic table: select an element, press "Hear Description", then rerun
+  once more. Every rerun re-sends the page, so an inlined clip is paid for
+  again each time.
+- Voice prompts: enable accessibility mode, which speaks the menu prompts,
+  then rerun once more.
+
+After each step it reports the serialized size of every element the app
+sent (what goes over the websocket) and the pickled size of
+st.session_state.element_audio. For the voice prompts it also lists the
+size of each prompt's player element.
+
+The LLM, TTS and embedding backends default to the offline ones.
+``--compare REV`` measures the tree at a git revision for a before/after
+table.
+
+Usage (from the repository root):
+    python -m benchmarks.audio_payload [--compare REV]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.import_time import ROOT, extract
+
+# Runs inside the measured tree; prints {"steps": {step: {"payload": bytes, "session": bytes}}, "prompts": [bytes]}
+DRIVER = """
+import json, pickle
+from streamlit.testing.v1 import AppTest
+
+
+def payload(node):
+    proto = getattr(node, "proto", None)
+    size = proto.ByteSize() if hasattr(proto, "ByteSize") else 0
+    return size + sum(payload(child) for child in getattr(node, "children", {}).values())
+
+
+def measure(at):
+    audio = at.session_state["element_audio"] if "element_audio" in at.session_state else None
+    return {"payload": payload(at._tree), "session": len(pickle.dumps(audio))}
+
+
+def check(at):
+    if at.exception:
+        raise SystemExit(at.exception[0].message)
+
+
+steps = {}
+at = AppTest.from_file("app.py", default_timeout=300).run()
+if any(radio.key == "section" for radio in at.radio):
+    at.radio(key="section").set_value("Periodic Table").run()
+next(b for b in at.button if b.key == "btn_3_7_26").click().run()
+steps["select element"] = measure(at)
+next(b for b in at.button if b.key == "hear_desc").click().run()
+steps["hear description"] = measure(at)
+at.run()
+steps["next rerun"] = measure(at)
+check(at)
+
+at = AppTest.from_file("app.py", default_timeout=300).run()
+next(b for b in at.button if "Enable Accessibility Mode" in b.label).click().run()
+steps["voice prompts"] = measure(at)
+# Prompts are delivered through components.html (iframe) in newer trees and st.markdown in older ones
+prompts = [node.proto.ByteSize() for node in at.get("iframe")]
+prompts += [node.proto.ByteSize() for node in at.markdown if "<audio" in node.value]
+at.run()
+steps["voice next rerun"] = measure(at)
+check(at)
+print(json.dumps({"steps": steps, "prompts": prompts}))
+"""
+
+
+def measure(tree):
+    env = dict(os.environ)
+    env.setdefault("LLM_BACKEND", "synthetic")
+    env.setdefault("TTS_BACKEND", "fake")
+    env.setdefault("EMBEDDING_BACKEND", "fake")
+    # The default configuration serves clips without a separate audio endpoint
+    env.pop("AUDIO_PORT", None)
+    env.pop("AUDIO_BASE_URL", None)
+    proc = subprocess.run([sys.executable, "-c", DRIVER], cwd=tree, env=env, capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(f"Driving app.py in {tree} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--compare", metavar="REV", help="Git revision to measure as the baseline")
+    args = parser.parse_args()
+
+    results = {}
+    if args.compare:
+        with tempfile.TemporaryDirectory() as tree:
+            extract(args.compare, tree)
+            results[args.compare] = measure(tree)
+    results["working tree"] = measure(ROOT)
+
+    print(f"{'tree':<14} {'step':<18} {'websocket KB':>12} {'element_audio B':>16}")
+    for label, result in results.items():
+        for step, sizes in result["steps"].items():
+            print(f"{label[:14]:<14} {step:<18} {sizes['payload'] / 1024:>12.1f} {sizes['session']:>16}")
+
+    print(f"\n{'tree':<14} {'voice prompt element bytes'}")
+    for label, result in results.items():
+        print(f"{label[:14]:<14} {', '.join(str(size) for size in result['prompts']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
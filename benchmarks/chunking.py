@@ -0,0 +1,141 @@
+# benchmarks/chunking.py
+"""Sweep chunk sizes and report retrieval hit rate, prompt tokens and latency.
+
+Each configuration is ingested into its own temporary index through the
+normal pipeline, then every question in the gold set is run through
+hybrid retrieval. A question is a hit when any retrieved chunk contains one
+of its expected answers. The legacy 10,000/1,000 character splitter is
+included as the baseline.
+
+The gold set is a JSON Lines file with one question per line:
+    {"question": "What is the hybridization of carbon in ethene?", "answers": ["sp2", "sp²"]}
+
+Embeddings go through the shared embedding cache, so repeated sweeps over
+the same PDFs only pay for chunks they have not seen. Set
+EMBEDDING_BACKEND=fake to run offline (hit rates then mostly reflect BM25).
+
+Usage (from the repository root):
+    python -m benchmarks.chunking notes.pdf past_paper.pdf --gold gold.jsonl
+        [--sizes 128 256 512 1024] [--overlap 0.125] [--k 4] [--answer]
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+import unicodedata
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from chunker import split_text
+from ingestion import ingest_documents
+from pdf_pipeline import iter_pdf_pages, iter_page_chunks
+from tokens import estimate_tokens
+from vector_store import registry
+
+# Instructions and chat-history headers the app's stuff prompt adds around the context
+PROMPT_OVERHEAD_TOKENS = 150
+
+
+def normalize(text):
+    return " ".join(unicodedata.normalize("NFKC", text).lower().split())
+
+
+def load_gold(path):
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                answers = item.get("answers") or [item["answer"]]
+                questions.append((item["question"], [normalize(a) for a in answers]))
+    return questions
+
+
+def legacy_split(text):
+    """The original splitter, kept here as the baseline"""
+    return RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=1000).split_text(text)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def answer_latency(question, context):
+    """Time a full Gemini answer over the retrieved context"""
+    import llm_gateway
+
+    result = llm_gateway.generate(f"Context:\n{context}\n\nQuestion: {question}\n\nAnswer in Sinhala:",
+                                  temperature=0.3, feature="benchmark")
+    return result.latency_ms / 1000
+
+
+def run_config(label, splitter, pdfs, gold, k, answer):
+    with tempfile.TemporaryDirectory() as index_dir:
+        start = time.perf_counter()
+        summary = ingest_documents(
+            [io.BytesIO(data) for data in pdfs],
+            lambda docs: iter_page_chunks(iter_pdf_pages(docs), splitter),
+            index_dir=index_dir,
+        )
+        ingest_seconds = time.perf_counter() - start
+
+        hits, prompt_tokens, retrieval_ms, answer_seconds = 0, [], [], []
+        for question, answers in gold:
+            start = time.perf_counter()
+            docs = registry.hybrid_search(question, k=k, index_dir=index_dir)
+            retrieval_ms.append((time.perf_counter() - start) * 1000)
+
+            context = "\n\n".join(doc.page_content for doc in docs)
+            prompt_tokens.append(estimate_tokens(context) + estimate_tokens(question) + PROMPT_OVERHEAD_TOKENS)
+            if any(answer in normalize(context) for answer in answers):
+                hits += 1
+            if answer:
+                answer_seconds.append(answer_latency(question, context))
+
+    line = (f"{label:<18} {len(summary['chunks']):>7,} {ingest_seconds:8.1f}  {hits / len(gold):7.1%}"
+            f"  {statistics.mean(prompt_tokens):9,.0f}  {statistics.median(retrieval_ms):7.1f}"
+            f"  {percentile(retrieval_ms, 0.95):7.1f}")
+    if answer_seconds:
+        line += f"  {statistics.median(answer_seconds):8.2f}  {percentile(answer_seconds, 0.95):8.2f}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdfs", nargs="+", help="PDFs to index")
+    parser.add_argument("--gold", required=True, help="JSON Lines gold question set")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[128, 256, 512, 1024],
+                        help="Chunk sizes in tokens")
+    parser.add_argument("--overlap", type=float, default=0.125, help="Overlap as a fraction of chunk size")
+    parser.add_argument("--k", type=int, default=4, help="Chunks retrieved per question")
+    parser.add_argument("--answer", action="store_true", help="Also time a Gemini answer per question")
+    args = parser.parse_args()
+
+    pdfs = []
+    for path in args.pdfs:
+        with open(path, "rb") as f:
+            pdfs.append(f.read())
+    gold = load_gold(args.gold)
+    print(f"{len(pdfs)} PDFs, {len(gold)} gold questions, k={args.k}, "
+          f"embeddings={os.getenv('EMBEDDING_BACKEND', 'google')}\n")
+
+    header = (f"{'config':<18} {'chunks':>7} {'ingest s':>8}  {'hit@k':>7}  {'prompt tok':>9}"
+              f"  {'p50 ms':>7}  {'p95 ms':>7}")
+    if args.answer:
+        header += f"  {'ans p50':>8}  {'ans p95':>8}"
+    print(header)
+
+    run_config("legacy 10000ch", legacy_split, pdfs, gold, args.k, args.answer)
+    for size in args.sizes:
+        overlap = int(size * args.overlap)
+        run_config(f"tokens {size}/{overlap}",
+                   lambda text, size=size, overlap=overlap: split_text(text, size, overlap),
+                   pdfs, gold, args.k, args.answer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/import_time.py
+"""Measure the app's cold start: import time by package, first-render wall time and peak RSS.
+
+Each run is a fresh interpreter started with ``python -X importtime`` that
+renders app.py once through streamlit.testing's AppTest, so nothing is
+already imported or cached. The LLM, TTS and embedding backends default to
+the offline ones so the run needs no network.
+
+``--compare REV`` also measures the tree at a git revision (extracted with
+``git archive`` into a temporary directory) for a before/after table.
+
+Usage (from the repository root):
+    python -m benchmarks.import_time [--runs 3] [--top 15] [--compare HEAD~1]
+"""
+import argparse
+import os
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RENDER = "from streamlit.testing.v1 import AppTest; AppTest.from_file('app.py', default_timeout=300).run()"
+# "import time: self [us] | cumulative | imported package"
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(tree):
+    """Render app.py once in a fresh interpreter; return wall seconds, max RSS MB and imports"""
+    env = dict(os.environ)
+    env.setdefault("LLM_BACKEND", "synthetic")
+    env.setdefault("TTS_BACKEND", "fake")
+    env.setdefault("EMBEDDING_BACKEND", "fake")
+    before = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", RENDER],
+                          cwd=tree, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if proc.returncode:
+        raise RuntimeError(f"Rendering app.py in {tree} failed:\n{proc.stderr[-2000:]}")
+    # ru_maxrss is the largest child so far, so only a new peak is attributable to this run
+    rss_mb = max(before, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1e3
+
+    # Top-level packages only: the cumulative time of "langchain" already includes its submodules
+    packages = defaultdict(float)
+    for match in IMPORT_LINE.finditer(proc.stderr):
+        _, cumulative, indent, name = match.groups()
+        if len(indent) == 1:
+            packages[name.split(".")[0]] += int(cumulative) / 1e6
+    return wall, rss_mb, dict(packages)
+
+
+def profile(tree, runs):
+    """Median wall time, peak RSS and per-package import seconds over ``runs`` cold starts"""
+    walls, rss, imports = [], [], defaultdict(list)
+    for _ in range(runs):
+        wall, rss_mb, packages = measure(tree)
+        walls.append(wall)
+        rss.append(rss_mb)
+        for name, seconds in packages.items():
+            imports[name].append(seconds)
+    return {
+        "wall": statistics.median(walls),
+        "rss": max(rss),
+        "imports": {name: statistics.median(s) for name, s in imports.items()},
+    }
+
+
+def extract(rev, into):
+    archive = subprocess.run(["git", "archive", rev], cwd=ROOT, capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", into], input=archive, check=True)
+
+
+def report(label, result, top):
+    print(f"{label}: cold render {result['wall']:.2f} s, peak RSS {result['rss']:.0f} MB, "
+          f"{sum(result['imports'].values()):.2f} s importing")
+    ranked = sorted(result["imports"].items(), key=lambda item: -item[1])[:top]
+    for name, seconds in ranked:
+        print(f"  {name:<32} {seconds * 1000:>8.0f} ms")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts per tree; medians are reported")
+    parser.add_argument("--top", type=int, default=15, help="Packages to list by cumulative import time")
+    parser.add_argument("--compare", metavar="REV", help="Git revision to measure as the baseline")
+    args = parser.parse_args()
+
+    current = profile(ROOT, args.runs)
+    if not args.compare:
+        report("working tree", current, args.top)
+        return
+
+    with tempfile.TemporaryDirectory() as tree:
+        extract(args.compare, tree)
+        baseline = profile(tree, args.runs)
+    report(args.compare, baseline, args.top)
+    report("working tree", current, args.top)
+
+    print(f"{'package':<32} {args.compare[:10]:>10} {'now':>10} {'saved':>10}")
+    names = sorted(set(baseline["imports"]) | set(current["imports"]),
+                   key=lambda n: -baseline["imports"].get(n, 0))[:args.top]
+    for name in names:
+        before = baseline["imports"].get(name, 0) * 1000
+        after = current["imports"].get(name, 0) * 1000
+        print(f"{name:<32} {before:>8.0f}ms {after:>8.0f}ms {before - after:>8.0f}ms")
+    print(f"\ncold render {baseline['wall']:.2f} s -> {current['wall']:.2f} s, "
+          f"peak RSS {baseline['rss']:.0f} MB -> {current['rss']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
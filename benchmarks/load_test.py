@@ -0,0 +1,209 @@
+# benchmarks/load_test.py
+"""Drive concurrent simulated student sessions through the app and report capacity.
+
+Each session is a headless streamlit.testing AppTest running app.py in this
+process, so sessions share module-level state (index registry, caches, LLM
+gateway) just as they do under one ``streamlit run``. Sessions loop over a
+script of realistic steps:
+
+    chat        ask a chat question in Sinhala teacher mode
+    exam        pick a topic, generate a mock exam, answer it and submit
+    periodic    open the periodic table, select an element, hear its description
+    screenshot  solve a screenshot question
+
+AppTest cannot drive st.file_uploader, so the screenshot step calls
+image_processor.process_screenshot directly with a generated image in
+teacher mode; its time is reported as a rerun.
+
+The LLM, TTS and embeddings default to the offline synthetic/fake backends
+so the numbers measure the app's own overhead. Override LLM_BACKEND (e.g.
+replay) or LLM_SYNTHETIC_LATENCY in the environment to change that.
+
+Usage (from the repository root):
+    python -m benchmarks.load_test [--sessions 1 5 10 20] [--rounds 3] [--steps chat exam periodic screenshot]
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("LLM_BACKEND", "synthetic")
+os.environ.setdefault("TTS_BACKEND", "fake")
+os.environ.setdefault("EMBEDDING_BACKEND", "fake")
+os.environ.setdefault("LLM_RPM", "0")
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+STEPS = ("chat", "exam", "periodic", "screenshot")
+QUESTIONS = [
+    "What is the structure of benzene?",
+    "Explain chemical bonding",
+    "What is a mole concept?",
+    "ඇල්කීන සහ ඇල්කේන අතර වෙනස කුමක්ද?",
+    "Why is water a polar molecule?",
+]
+EXAM_TOPICS = ["Atomic Structure", "Chemical Bonding"]
+# (row, column, atomic number) of periodic table buttons; keys follow smart_table's scheme
+ELEMENTS = [(0, 0, 1), (1, 13, 6), (3, 7, 26), (2, 16, 17)]
+
+
+def rss_mb():
+    """Current resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def find_button(at, label=None, key=None):
+    for button in at.button:
+        if (key and button.key == key) or (label and button.label == label):
+            return button
+    raise LookupError(f"No button {key or label!r} on the page")
+
+
+class Session:
+    """One simulated student; records the latency of every rerun it triggers"""
+
+    def __init__(self, seed, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.rng = random.Random(seed)
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.latencies = []
+        self.errors = 0
+
+    def run(self, action=None):
+        started = time.perf_counter()
+        if action:
+            action()
+        else:
+            self.at.run()
+        self.latencies.append(time.perf_counter() - started)
+        if self.at.exception:
+            self.errors += 1
+
+    def open_section(self, section):
+        """Select a section in the navigation; only the selected one is rendered"""
+        if self.at.session_state["current_tab"] != section:
+            self.run(lambda: self.at.radio(key="section").set_value(section).run())
+
+    def chat(self):
+        self.open_section("Chat")
+        if not self.at.session_state["teacher_mode"]:
+            toggle = next(t for t in self.at.toggle if "Sinhala Chemistry Teacher Mode" in t.label)
+            self.run(lambda: toggle.set_value(True).run())
+        question = self.rng.choice(QUESTIONS)
+        self.run(lambda: self.at.chat_input(key="chat_input").set_value(question).run())
+
+    def exam(self):
+        self.open_section("Exams")
+        self.run(lambda: self.at.selectbox(key="exam_topic").set_value(self.rng.choice(EXAM_TOPICS)).run())
+        self.run(lambda: find_button(self.at, label="📝 Generate Exam").click().run())
+        questions = self.at.session_state["exam"]["questions"]
+        for i in range(len(questions)):
+            radio = self.at.radio(key=f"exam_q{i}")
+            radio.set_value(self.rng.choice(radio.options))
+        self.run(lambda: find_button(self.at, label="✅ Submit Exam").click().run())
+
+    def periodic(self):
+        self.open_section("Periodic Table")
+        row, col, number = self.rng.choice(ELEMENTS)
+        self.run(lambda: find_button(self.at, key=f"btn_{row}_{col}_{number}").click().run())
+        self.run(lambda: find_button(self.at, key="hear_desc").click().run())
+
+    def screenshot(self):
+        from PIL import Image, ImageDraw
+
+        from image_processor import process_screenshot
+
+        image = Image.new("RGB", (640, 200), "white")
+        ImageDraw.Draw(image).text((10, 10), "Which of the following is an alkene?", fill="black")
+        started = time.perf_counter()
+        try:
+            process_screenshot(image, teacher_mode=True)
+        except Exception:
+            self.errors += 1
+        self.latencies.append(time.perf_counter() - started)
+
+    def play(self, steps, rounds):
+        self.run()
+        for _ in range(rounds):
+            for step in steps:
+                try:
+                    getattr(self, step)()
+                except Exception as e:
+                    self.errors += 1
+                    print(f"  {step} failed: {e}", file=sys.stderr)
+
+
+def run_load(sessions, steps, rounds, timeout):
+    """Run ``sessions`` concurrent sessions and return the measurements"""
+    cpu_start = time.process_time()
+    rss_start = rss_mb()
+    peak = [rss_start]
+    done = threading.Event()
+
+    def sample_rss():
+        while not done.wait(0.2):
+            peak[0] = max(peak[0], rss_mb())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        players = list(pool.map(lambda i: Session(i, timeout), range(sessions)))
+        list(pool.map(lambda p: p.play(steps, rounds), players))
+    wall = time.perf_counter() - started
+    done.set()
+    sampler.join()
+
+    latencies = [l for p in players for l in p.latencies]
+    return {
+        "sessions": sessions,
+        "reruns": len(latencies),
+        "errors": sum(p.errors for p in players),
+        "wall": wall,
+        "throughput": len(latencies) / wall,
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "mean": statistics.mean(latencies) * 1000,
+        "cpu": (time.process_time() - cpu_start) / wall,
+        "rss": peak[0],
+        "rss_per_session": (peak[0] - rss_start) / sessions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 20],
+                        help="Concurrent session counts to measure")
+    parser.add_argument("--rounds", type=int, default=3, help="Times each session repeats its script")
+    parser.add_argument("--steps", nargs="+", choices=STEPS, default=list(STEPS))
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed per rerun")
+    args = parser.parse_args()
+
+    print(f"LLM={os.environ['LLM_BACKEND']} TTS={os.environ['TTS_BACKEND']} "
+          f"embeddings={os.environ['EMBEDDING_BACKEND']} steps={' '.join(args.steps)}\n")
+    print(f"{'sessions':>8} {'reruns':>7} {'errors':>6} {'rerun/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'CPU':>6} {'RSS MB':>8} {'MB/sess':>8}")
+    for sessions in args.sessions:
+        r = run_load(sessions, args.steps, args.rounds, args.timeout)
+        print(f"{r['sessions']:>8} {r['reruns']:>7} {r['errors']:>6} {r['throughput']:>8.2f} "
+              f"{r['p50']:>8.0f} {r['p95']:>8.0f} {r['p99']:>8.0f} {r['cpu']:>6.0%} "
+              f"{r['rss']:>8.0f} {r['rss_per_session']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
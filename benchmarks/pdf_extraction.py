@@ -0,0 +1,73 @@
+# benchmarks/pdf_extraction.py
+"""Compare the original single-threaded get_pdf_text with the page pipeline.
+
+Usage (from the repository root):
+    python -m benchmarks.pdf_extraction path/to/textbook.pdf [--copies 3] [--workers 4]
+"""
+import argparse
+import io
+import time
+import tracemalloc
+
+from PyPDF2 import PdfReader
+
+from pdf_pipeline import iter_pdf_pages
+
+
+def legacy_get_pdf_text(pdf_docs):
+    """The original implementation, kept here as the baseline"""
+    text = ""
+    for pdf in pdf_docs:
+        pdf_reader = PdfReader(pdf)
+        for page in pdf_reader.pages:
+            text += page.extract_text()
+    return text
+
+
+def pipeline_get_pdf_text(pdf_docs, workers):
+    return "".join(text for _, _, text in iter_pdf_pages(pdf_docs, max_workers=workers))
+
+
+def pipeline_consume(pdf_docs, workers):
+    """Stream pages without joining them, as ingestion does"""
+    total = 0
+    for _, _, text in iter_pdf_pages(pdf_docs, max_workers=workers):
+        total += len(text)
+    return total
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = result if isinstance(result, int) else len(result)
+    print(f"{label:<28} {elapsed:8.2f} s   peak {peak / 1e6:8.1f} MB   {size:>12,} chars")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf", help="A multi-hundred-page PDF to extract")
+    parser.add_argument("--copies", type=int, default=1, help="Treat the PDF as this many uploads")
+    parser.add_argument("--workers", type=int, default=4, help="Process pool size for the pipeline")
+    args = parser.parse_args()
+
+    with open(args.pdf, "rb") as f:
+        data = f.read()
+    pages = len(PdfReader(io.BytesIO(data)).pages)
+    print(f"{args.pdf}: {pages} pages x {args.copies} copies, {args.workers} workers\n")
+
+    def docs():
+        return [io.BytesIO(data) for _ in range(args.copies)]
+
+    baseline = measure("legacy get_pdf_text", lambda: legacy_get_pdf_text(docs()))
+    pipeline = measure("pipeline (joined)", lambda: pipeline_get_pdf_text(docs(), args.workers))
+    measure("pipeline (streamed)", lambda: pipeline_consume(docs(), args.workers))
+    print(f"\nSpeed-up: {baseline / pipeline:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/rerun_time.py
+"""Time app reruns: a plain rerun and a periodic-table element click.
+
+Each tree is driven in its own interpreter through streamlit.testing's
+AppTest with the offline LLM, TTS and embedding backends. When the app has
+section navigation (a radio keyed "section"), the periodic table is selected
+first, so only that section runs. Older trees built on st.tabs render every
+tab on each rerun.
+
+``--compare REV`` also measures the tree at a git revision for a
+before/after table; e.g. ``--compare HEAD~1`` shows the gain of rendering
+only the active section.
+
+Usage (from the repository root):
+    python -m benchmarks.rerun_time [--reruns 20] [--compare REV]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.import_time import ROOT, extract
+
+# Runs inside the measured tree; prints {"widgets": n, "rerun": [s, ...], "element_click": [s, ...]}
+DRIVER = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+reruns = int(sys.argv[1])
+keys = ["btn_0_0_1", "btn_1_13_6", "btn_3_7_26", "btn_2_16_17"]
+at = AppTest.from_file("app.py", default_timeout=300).run()
+if any(radio.key == "section" for radio in at.radio):
+    at.radio(key="section").set_value("Periodic Table").run()
+
+timings = {"widgets": len(at.button) + len(at.markdown), "rerun": [], "element_click": []}
+for i in range(reruns):
+    started = time.perf_counter()
+    at.run()
+    timings["rerun"].append(time.perf_counter() - started)
+
+    button = next(b for b in at.button if b.key == keys[i % len(keys)])
+    started = time.perf_counter()
+    button.click().run()
+    timings["element_click"].append(time.perf_counter() - started)
+    if at.exception:
+        raise SystemExit(at.exception[0].message)
+print(json.dumps(timings))
+"""
+
+
+def measure(tree, reruns):
+    env = dict(os.environ)
+    env.setdefault("LLM_BACKEND", "synthetic")
+    env.setdefault("TTS_BACKEND", "fake")
+    env.setdefault("EMBEDDING_BACKEND", "fake")
+    proc = subprocess.run([sys.executable, "-c", DRIVER, str(reruns)],
+                          cwd=tree, env=env, capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(f"Driving app.py in {tree} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def summarize(values):
+    values = sorted(values)
+    return statistics.median(values) * 1000, values[min(len(values) - 1, int(0.95 * len(values)))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=20, help="Reruns of each kind to time")
+    parser.add_argument("--compare", metavar="REV", help="Git revision to measure as the baseline")
+    args = parser.parse_args()
+
+    results = {}
+    if args.compare:
+        with tempfile.TemporaryDirectory() as tree:
+            extract(args.compare, tree)
+            results[args.compare] = measure(tree, args.reruns)
+    results["working tree"] = measure(ROOT, args.reruns)
+
+    print(f"{'tree':<14} {'elements':>8} {'rerun p50':>10} {'rerun p95':>10} {'click p50':>10} {'click p95':>10}")
+    for label, timings in results.items():
+        rerun_p50, rerun_p95 = summarize(timings["rerun"])
+        click_p50, click_p95 = summarize(timings["element_click"])
+        print(f"{label[:14]:<14} {timings['widgets']:>8} {rerun_p50:>8.0f}ms {rerun_p95:>8.0f}ms "
+              f"{click_p50:>8.0f}ms {click_p95:>8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
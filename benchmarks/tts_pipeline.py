@@ -0,0 +1,74 @@
+# benchmarks/tts_pipeline.py
+"""Compare time-to-first-audio of whole-answer and sentence-segmented speech synthesis.
+
+Runs against the offline fake synthesizer (silent MP3 with a per-call and
+per-word delay standing in for gTTS) with the TTS cache bypassed. Uncached
+synthesis still checks the audio bundle first, but the answer is dynamic
+text that is never prebuilt, so every run pays for synthesis. Pass --live
+to time real gTTS calls instead.
+
+Usage (from the repository root):
+    python -m benchmarks.tts_pipeline [--runs 5] [--workers 4] [--live]
+"""
+import argparse
+import os
+import statistics
+import time
+
+# A typical teacher-mode answer: several Sinhala sentences with formulas and an English aside
+ANSWER = (
+    "පළමු පියවර: ජලයේ අණුක සූත්‍රය H2O වේ. "
+    "ඔක්සිජන් පරමාණුව හයිඩ්‍රජන් පරමාණු දෙකකට සහසංයුජ බන්ධන මගින් බැඳී ඇත. "
+    "දෙවන පියවර: ඔක්සිජන්හි විද්‍යුත් සෘණතාව 3.44 ක් වන අතර හයිඩ්‍රජන්හි එය 2.20 කි. "
+    "එබැවින් බන්ධන ඉලෙක්ට්‍රෝන ඔක්සිජන් දෙසට ඇදී යයි. "
+    "තෙවන පියවර: අණුවේ හැඩය නැමුණු (bent) හැඩයක් වන අතර බන්ධන කෝණය 104.5° පමණ වේ. "
+    "මේ නිසා ද්විධ්‍රැව ඝූර්ණ එකිනෙක අවලංගු නොවේ. "
+    "නිගමනය: ජලය ධ්‍රැවීය අණුවකි. "
+    "In short, water is polar because its bent shape leaves a net dipole moment."
+)
+
+
+def time_whole(synthesize_fn, language):
+    started = time.perf_counter()
+    synthesize_fn(ANSWER, language)
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+
+def time_segmented(synthesize_segments, synthesize_fn, language):
+    started = time.perf_counter()
+    first = None
+    for _ in synthesize_segments(ANSWER, language, synthesize_fn=synthesize_fn):
+        if first is None:
+            first = time.perf_counter() - started
+    return first, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4, help="TTS_WORKERS for the segmented pipeline")
+    parser.add_argument("--live", action="store_true", help="Use gTTS instead of the fake synthesizer")
+    args = parser.parse_args()
+
+    os.environ["TTS_WORKERS"] = str(args.workers)
+    if not args.live:
+        os.environ["TTS_BACKEND"] = "fake"
+    import tts
+
+    def uncached(text, language):
+        return tts.synthesize(text, language, cache=False)
+
+    segments = tts.split_sentences(ANSWER)
+    print(f"backend={tts.TTS_BACKEND} workers={tts.TTS_WORKERS} answer={len(ANSWER)} chars, "
+          f"{len(segments)} segments\n")
+    print(f"{'mode':<10} {'first audio':>12} {'all audio':>10}")
+    for label, run in (("whole", lambda: time_whole(uncached, "si")),
+                       ("segmented", lambda: time_segmented(tts.synthesize_segments, uncached, "si"))):
+        firsts, totals = zip(*(run() for _ in range(args.runs)))
+        print(f"{label:<10} {statistics.median(firsts) * 1000:>10.0f}ms "
+              f"{statistics.median(totals) * 1000:>8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
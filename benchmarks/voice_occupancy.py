@@ -0,0 +1,86 @@
+# benchmarks/voice_occupancy.py
+"""Measure how long an accessibility-mode session holds a server script thread.
+
+Drives app.py through streamlit.testing's AppTest: enable accessibility
+mode, then rerun every VOICE_POLL_SECONDS for a fixed window, the way the
+voice flow's fragment timer does in a browser. A thread is occupied while a
+rerun runs. Occupancy is the fraction of the window spent inside reruns,
+so 100% means one server thread is permanently tied up by one blind
+student.
+
+There is no browser here to report that a prompt has played, so the voice
+flow falls back to each clip's MP3 duration. No microphone is attached
+either, so every listening step fails fast; the numbers therefore show the
+cost of prompts and waiting, not of recognising speech. LLM, TTS and
+embedding backends default to the offline ones.
+
+``--compare REV`` measures the tree at a git revision for a before/after
+table; older trees slept on the script thread while prompts played.
+
+Usage (from the repository root):
+    python -m benchmarks.voice_occupancy [--seconds 30] [--compare REV]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.import_time import ROOT, extract
+
+# Runs inside the measured tree; prints {"reruns": [seconds, ...], "window": seconds}
+DRIVER = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+window, poll = float(sys.argv[1]), float(sys.argv[2])
+at = AppTest.from_file("app.py", default_timeout=600).run()
+next(b for b in at.button if "Enable Accessibility Mode" in b.label).click()
+reruns = []
+started = time.perf_counter()
+while time.perf_counter() - started < window:
+    run_started = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - run_started)
+    time.sleep(max(0.0, poll - reruns[-1]))
+print(json.dumps({"reruns": reruns, "window": time.perf_counter() - started}))
+"""
+
+
+def measure(tree, seconds, poll):
+    env = dict(os.environ)
+    env.setdefault("LLM_BACKEND", "synthetic")
+    env.setdefault("TTS_BACKEND", "fake")
+    env.setdefault("EMBEDDING_BACKEND", "fake")
+    proc = subprocess.run([sys.executable, "-c", DRIVER, str(seconds), str(poll)],
+                          cwd=tree, env=env, capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(f"Driving app.py in {tree} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=30, help="Length of the measured window")
+    parser.add_argument("--poll", type=float, default=float(os.getenv("VOICE_POLL_SECONDS", "0.5")),
+                        help="Seconds between reruns, as the fragment timer would trigger them")
+    parser.add_argument("--compare", metavar="REV", help="Git revision to measure as the baseline")
+    args = parser.parse_args()
+
+    results = {}
+    if args.compare:
+        with tempfile.TemporaryDirectory() as tree:
+            extract(args.compare, tree)
+            results[args.compare] = measure(tree, args.seconds, args.poll)
+    results["working tree"] = measure(ROOT, args.seconds, args.poll)
+
+    print(f"{'tree':<14} {'reruns':>7} {'busy s':>8} {'occupancy':>10} {'longest s':>10}")
+    for label, r in results.items():
+        busy = sum(r["reruns"])
+        print(f"{label[:14]:<14} {len(r['reruns']):>7} {busy:>8.1f} {busy / r['window']:>10.0%} "
+              f"{max(r['reruns']):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# chunker.py
+import os
+import re
+
+from tokens import estimate_tokens
+
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+
+# Units that follow a quantity at the start of a body line, e.g. "0.50 mol of ethane ..."
+UNITS = r"(?:mol|mmol|g|mg|kg|l|ml|dm|cm|m|nm|s|min|h|k|j|kj|pa|kpa|atm|v|a|w)"
+# "1.2 Chemical Bonding", "UNIT 3", "Chapter 4", "පාඩම 2"; a numbered heading needs a word-like title
+# that is not a unit and does not end like a sentence
+HEADING_PATTERN = re.compile(
+    r"^(?:(?:unit|chapter|part|section|පාඩම|ඒකකය|කොටස)\s*[\divx]+\b.*"
+    rf"|[1-9]\d*(?:\.\d+)+\s+(?!{UNITS}\b)[^\W\d_].{{0,80}}(?<![.!?]))$",
+    re.IGNORECASE,
+)
+# A short line in capitals, e.g. "ORGANIC CHEMISTRY"
+CAPS_HEADING_PATTERN = re.compile(r"^[A-Z][A-Z0-9 ,\-&()]{3,80}$")
+# Main numbered questions in A/L papers: "01.", "1)", "Q1", "Question 5", "ප්‍රශ්නය 3"
+QUESTION_PATTERN = re.compile(
+    r"^\s*(?:\d{1,2}[.)]\s+|q\s*\d{1,2}\b|question\s+\d{1,2}\b|ප්‍රශ්නය\s*\d{1,2})",
+    re.IGNORECASE,
+)
+# Sub-parts "(a)", "(ii)", "a)" stay with their question
+SUBPART_PATTERN = re.compile(r"^\s*\(?(?:[a-h]|i{1,3}|iv|v|vi{0,3})\)\s+", re.IGNORECASE)
+# Lines that look like equations or reaction schemes are never split from their neighbours
+EQUATION_PATTERN = re.compile(r"(?:->|→|⟶|⇌|<=>|=|\+).*[A-Za-z0-9]|\b[A-Z][a-z]?\d*(?:\([a-z]+\))?\s*[+→=]")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?।])\s+")
+
+
+def is_heading(line):
+    stripped = line.strip()
+    if not stripped or len(stripped) > 100 or EQUATION_PATTERN.search(stripped):
+        return False
+    return bool(HEADING_PATTERN.match(stripped) or CAPS_HEADING_PATTERN.match(stripped))
+
+
+def split_sections(text):
+    """Split text into (heading, [block, ...]) sections.
+
+    A section starts at a heading or a main numbered question. Blocks are
+    paragraphs; equation lines and question sub-parts are kept in the
+    paragraph they belong to.
+    """
+    sections = []
+    heading = ""
+    # Sections already emitted when the current heading was set, to tell whether it has a body yet
+    heading_start = 0
+    blocks = []
+    current = []
+
+    def end_block():
+        if current:
+            blocks.append("\n".join(current))
+            current.clear()
+
+    def end_section():
+        end_block()
+        if blocks:
+            sections.append((heading, list(blocks)))
+            blocks.clear()
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            end_block()
+        elif is_heading(stripped):
+            end_section()
+            if heading and len(sections) == heading_start:
+                # A heading straight after another ("ORGANIC CHEMISTRY" then "1.1 Alkanes") keeps both
+                heading = f"{heading}\n{stripped}"
+            else:
+                heading = stripped
+                heading_start = len(sections)
+        elif QUESTION_PATTERN.match(stripped) and not SUBPART_PATTERN.match(stripped):
+            end_section()
+            current.append(stripped)
+        elif EQUATION_PATTERN.search(stripped) and not current and blocks:
+            # PDFs often set equations apart with blank lines; keep them with the text above
+            current.extend(blocks.pop().split("\n"))
+            current.append(stripped)
+        else:
+            current.append(stripped)
+    end_section()
+    if heading and len(sections) == heading_start:
+        # A trailing heading with nothing under it is still text worth indexing
+        sections.append(("", [heading]))
+    return sections
+
+
+def _split_oversized(block, max_tokens):
+    """Split a block that is larger than a chunk by sentences, then by characters"""
+    pieces = []
+    current = ""
+    for sentence in SENTENCE_PATTERN.split(block):
+        candidate = f"{current} {sentence}".strip()
+        if estimate_tokens(candidate) <= max_tokens:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        while estimate_tokens(sentence) > max_tokens:
+            cut = max(1, int(len(sentence) * max_tokens / estimate_tokens(sentence)))
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:]
+        current = sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text(text, chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Split text into chunks of about ``chunk_tokens`` tokens that respect document structure.
+
+    Chunks never cross a heading or a main numbered question, and never cut an
+    equation or question sub-part away from its paragraph unless the
+    paragraph alone is larger than a chunk. Each chunk is prefixed with its
+    section heading so it still makes sense when retrieved on its own, and
+    consecutive chunks in a section share up to ``overlap_tokens`` of trailing
+    paragraphs.
+    """
+    chunks = []
+    for heading, blocks in split_sections(text):
+        prefix = f"{heading}\n" if heading else ""
+        budget = max(32, chunk_tokens - estimate_tokens(prefix))
+
+        pieces = []
+        for block in blocks:
+            if estimate_tokens(block) > budget:
+                pieces.extend(_split_oversized(block, budget))
+            else:
+                pieces.append(block)
+
+        current = []
+        current_tokens = 0
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > budget:
+                chunks.append(prefix + "\n\n".join(current))
+                # Carry trailing paragraphs forward as overlap
+                overlap = []
+                overlap_size = 0
+                for previous in reversed(current):
+                    size = estimate_tokens(previous)
+                    if overlap_size + size > overlap_tokens or overlap_size + size + piece_tokens > budget:
+                        break
+                    overlap.insert(0, previous)
+                    overlap_size += size
+                current, current_tokens = overlap, overlap_size
+            current.append(piece)
+            current_tokens += piece_tokens
+        if current:
+            chunks.append(prefix + "\n\n".join(current))
+    return chunks
@@ -0,0 +1,106 @@
+# context_packing.py
+import os
+import re
+import time
+
+from lexical_index import tokenize
+from tokens import estimate_tokens
+
+# Chunks fetched from retrieval before packing
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "12"))
+# The old stuff chain sent the top 4 chunks of the legacy 10,000-character splitter
+BASELINE_K = 4
+LEGACY_CHUNK_CHARS = 10000
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+# Trade-off between relevance (1.0) and novelty (0.0) when ordering passages
+MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+
+
+def _normalize(paragraph):
+    return re.sub(r"\s+", " ", paragraph).strip().lower()
+
+
+def _similarity(a, b):
+    """Jaccard overlap of two term sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def mmr_order(texts, lambda_=MMR_LAMBDA):
+    """Order texts (given most relevant first) by maximal marginal relevance.
+
+    Relevance comes from the retrieval rank, since hybrid search fuses scores
+    that are not comparable across retrievers, and redundancy is the term
+    overlap with passages already chosen.
+    """
+    terms = [set(tokenize(text)) for text in texts]
+    remaining = list(range(len(texts)))
+    chosen = []
+    while remaining:
+        def score(i):
+            relevance = 1.0 - i / len(texts)
+            redundancy = max((_similarity(terms[i], terms[j]) for j in chosen), default=0.0)
+            return lambda_ * relevance - (1 - lambda_) * redundancy
+        best = max(remaining, key=score)
+        remaining.remove(best)
+        chosen.append(best)
+    return chosen
+
+
+def baseline_tokens(texts):
+    """Estimated tokens the old stuff prompt would have sent, at these chunks' tokens per character"""
+    sample = "\n\n".join(texts)
+    if not sample:
+        return 0
+    return round(estimate_tokens(sample) * BASELINE_K * LEGACY_CHUNK_CHARS / len(sample))
+
+
+def pack_context(docs, token_budget=CONTEXT_TOKEN_BUDGET):
+    """Build the prompt context from retrieved documents within a token budget.
+
+    Documents are reordered by MMR, paragraphs already present in an earlier
+    passage (chunk overlap, or the same text in two uploads) are dropped, and
+    passages are added in order while they fit the budget. The most relevant
+    passage is always included, cut down to the budget if necessary. Returns
+    the context string and a dict of measurements.
+    """
+    started = time.perf_counter()
+    texts = [doc.page_content for doc in docs]
+
+    seen = set()
+    passages = []
+    used = 0
+    for i in mmr_order(texts):
+        paragraphs = []
+        for paragraph in texts[i].split("\n\n"):
+            key = _normalize(paragraph)
+            if key and key not in seen:
+                seen.add(key)
+                # The first paragraph of a chunk carries its section heading on the line above
+                _, _, body = paragraph.partition("\n")
+                if body and _normalize(body) in seen:
+                    continue
+                seen.add(_normalize(body))
+                paragraphs.append(paragraph)
+        if not paragraphs:
+            continue
+        passage = "\n\n".join(paragraphs)
+        tokens = estimate_tokens(passage)
+        if used + tokens > token_budget:
+            if passages:
+                continue
+            passage = passage[:int(len(passage) * token_budget / tokens)]
+            tokens = estimate_tokens(passage)
+        passages.append(passage)
+        used += tokens
+
+    context = "\n\n".join(passages)
+    stats = {
+        "candidates": len(texts),
+        "passages": len(passages),
+        "baseline_tokens": baseline_tokens(texts),
+        "context_tokens": estimate_tokens(context),
+        "pack_ms": (time.perf_counter() - started) * 1000,
+    }
+    return context, stats
@@ -0,0 +1,138 @@
+# conversation_memory.py
+import contextvars
+import logging
+import os
+import threading
+
+import llm_gateway
+from lexical_index import tokenize
+from tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+MEMORY_TOKEN_BUDGET = int(os.getenv("CHAT_MEMORY_TOKENS", "1500"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKENS", "400"))
+MIN_RECENT_TURNS = 2
+# Words that point back at earlier turns ("explain it again", "ඒක මොකක්ද?"); a question using one,
+# or one this short, only makes sense with the conversation behind it
+FOLLOW_UP_WORDS = frozenset(
+    "it its this that these those they them their above previous earlier again same else "
+    "එය ඒක ඒ එම මෙය මේක ඒවා මේවා ඔවුන් ඉහත කලින් පෙර නැවත".split()
+)
+FOLLOW_UP_MAX_WORDS = 2
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a chemistry tutoring conversation with a Sri Lankan A/L student.
+Update the summary with the new turns below. Keep the topics discussed, compounds and formulas
+mentioned, and anything the student found difficult. Write in the language the student used.
+Keep it under {max_words} words.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}
+
+Updated summary:
+"""
+
+
+def format_turns(turns):
+    return "\n".join(
+        f"{'Student' if role == 'user' else 'Assistant'}: {content}" for role, content in turns
+    )
+
+
+def refers_back(question):
+    """Whether a question leans on earlier turns rather than standing on its own"""
+    words = tokenize(question)
+    return len(words) <= FOLLOW_UP_MAX_WORDS or any(word in FOLLOW_UP_WORDS for word in words)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text down to roughly max_tokens, keeping the beginning"""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    return text[:int(len(text) * max_tokens / tokens)].rstrip() + " …"
+
+
+def summarize_turns(summary, turns, max_tokens=SUMMARY_TOKEN_BUDGET):
+    """Fold new turns into an existing summary with Gemini"""
+    prompt = SUMMARY_PROMPT.format(
+        max_words=max(50, max_tokens // 2),
+        summary=summary or "(none yet)",
+        turns=format_turns(turns),
+    )
+    return llm_gateway.generate(prompt, temperature=0, feature="memory_summary").text.strip()
+
+
+class ConversationMemory:
+    """Token-bounded chat memory for one session.
+
+    Recent turns are kept verbatim. When they exceed ``token_budget`` the
+    oldest turns are folded into a running summary, down to half the budget
+    so the summarizer runs once every few exchanges rather than every turn.
+    Only the new turns are sent with the previous summary, so each update
+    costs the same however long the conversation has been going. The
+    summary is written on a background thread while the student reads the
+    answer; the next render() waits for it.
+    """
+
+    def __init__(self, token_budget=MEMORY_TOKEN_BUDGET, summarize=summarize_turns):
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self.summary = ""
+        self.turns = []
+        self._compacting = None
+
+    def _wait(self):
+        if self._compacting is not None:
+            self._compacting.join()
+            self._compacting = None
+
+    def _recent_tokens(self):
+        return sum(estimate_tokens(content) for _, content in self.turns)
+
+    def add_exchange(self, question, answer):
+        """Record a question and its answer, compacting older turns in the background if needed"""
+        self._wait()
+        self.turns.append(("user", question))
+        self.turns.append(("assistant", answer))
+        if self._recent_tokens() > self.token_budget:
+            # The copied context keeps the summary call tagged with this session's budget and request
+            context = contextvars.copy_context()
+            self._compacting = threading.Thread(target=context.run, args=(self._compact,),
+                                                daemon=True, name="memory-summary")
+            self._compacting.start()
+
+    def _compact(self):
+        folded = []
+        while len(self.turns) > MIN_RECENT_TURNS and self._recent_tokens() > self.token_budget // 2:
+            folded.append(self.turns.pop(0))
+        if not folded:
+            return
+        try:
+            self.summary = self.summarize(self.summary, folded)
+        except Exception as e:
+            # Losing detail is better than failing the chat; keep a truncated transcript instead
+            logger.warning("Conversation summary failed: %s", e)
+            self.summary = (self.summary + "\n" + format_turns(folded))[-SUMMARY_TOKEN_BUDGET * 4:]
+
+    def render(self):
+        """Return the chat history text for the prompt"""
+        self._wait()
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier conversation:\n{self.summary}")
+        if self.turns:
+            # A single very long answer must not blow the budget on its own
+            limit = self.token_budget // 2
+            turns = [(role, truncate_to_tokens(content, limit)) for role, content in self.turns]
+            parts.append(format_turns(turns))
+        return "\n\n".join(parts)
+
+    def clear(self):
+        self._wait()
+        self.summary = ""
+        self.turns = []
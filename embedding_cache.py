@@ -0,0 +1,188 @@
+# embedding_cache.py
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+from embedding_pipeline import embed_in_batches
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(".cache", "embeddings.sqlite3"))
+MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+
+def normalize_text(text):
+    """Normalize text so trivially different copies share a cache entry"""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_key(text):
+    """Return the cache key for a piece of text"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """SQLite-backed embedding store with a size cap and LRU eviction.
+
+    Vectors are stored as packed float32 blobs keyed by (model, text hash).
+    When the store grows past ``max_entries`` the least recently used tenth
+    is evicted.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                key TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, key)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model, keys):
+        """Return {key: vector} for the keys that are cached"""
+        found = {}
+        if not keys:
+            return found
+
+        unique_keys = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for i in range(0, len(unique_keys), 500):
+                batch = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE model = ? AND key = ?",
+                        [(now, model, key) for key, _ in rows],
+                    )
+            self._conn.commit()
+
+            hits = sum(1 for key in keys if key in found)
+            self._stats["hits"] += hits
+            self._stats["misses"] += len(keys) - hits
+        return found
+
+    def put_many(self, model, items):
+        """Store (key, vector) pairs and evict old entries if over the cap"""
+        if not items:
+            return
+        now = time.time()
+        rows = [(model, key, array("f", vector).tobytes(), now) for key, vector in items]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, key, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries down to 90% of the cap"""
+        target = int(self.max_entries * 0.9)
+        excess = self._count - target
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+        self._count = target
+        self._stats["evictions"] += excess
+        logger.info("Evicted %d embeddings from %s", excess, self.path)
+
+    def stats(self):
+        """Return hit/miss counts and the hit rate"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._count
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else None
+        return stats
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain embeddings wrapper that consults an EmbeddingStore first.
+
+    Document and query embeddings are cached separately because the
+    underlying model embeds them with different task types.
+    """
+
+    def __init__(self, embeddings, model_name, store):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.store = store
+
+    def _embed(self, texts, kind, embed_fn, progress=None):
+        model = f"{self.model_name}:{kind}"
+        keys = [text_key(t) for t in texts]
+        cached = self.store.get_many(model, keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            def checkpoint(batch, vectors):
+                # Each finished batch is stored immediately so a failed run can resume
+                fresh = [(text_key(t), v) for t, v in zip(batch, vectors)]
+                self.store.put_many(model, fresh)
+                cached.update(fresh)
+
+            embed_in_batches(list(missing.values()), embed_fn, on_batch=checkpoint, progress=progress)
+
+        return [cached[key] for key in keys]
+
+    def embed_documents(self, texts, progress=None):
+        return self._embed(texts, "document", self.embeddings.embed_documents, progress)
+
+    def embed_query(self, text):
+        return self._embed([text], "query", lambda t: [self.embeddings.embed_query(t[0])])[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_embedding_store():
+    """Return the embedding store shared by every session in this process"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = EmbeddingStore()
+        return _store
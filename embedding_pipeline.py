@@ -0,0 +1,138 @@
+# embedding_pipeline.py
+import hashlib
+import logging
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from langchain_core.embeddings import Embeddings
+
+from retry import is_retryable
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+MAX_WORKERS = int(os.getenv("EMBED_MAX_WORKERS", "4"))
+MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.getenv("EMBED_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("EMBED_BACKOFF_MAX", "30.0"))
+
+
+def embed_with_retry(embed_fn, texts, max_retries=MAX_RETRIES):
+    """Call embed_fn(texts), retrying transient failures with jittered exponential backoff"""
+    attempt = 0
+    while True:
+        try:
+            return embed_fn(texts)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+            attempt += 1
+            logger.warning("Embedding batch failed (%s); retry %d/%d in %.1f s",
+                           e, attempt, max_retries, delay)
+            time.sleep(delay)
+
+
+def embed_in_batches(texts, embed_fn, batch_size=BATCH_SIZE, max_workers=MAX_WORKERS,
+                     max_retries=MAX_RETRIES, on_batch=None, progress=None):
+    """Embed texts in batches on a bounded thread pool.
+
+    ``on_batch(texts, vectors)`` is called for every finished batch, so
+    callers can checkpoint results; if one batch ultimately fails, the
+    batches that did finish are still checkpointed before the error is
+    raised. ``progress(done, total)`` is called from the caller's thread,
+    which makes it safe to update Streamlit elements from it.
+    """
+    results = [None] * len(texts)
+    if not texts:
+        return results
+
+    batches = [(start, texts[start:start + batch_size]) for start in range(0, len(texts), batch_size)]
+    done = 0
+    if progress:
+        progress(0, len(texts))
+
+    def finish(start, batch, vectors):
+        nonlocal done
+        if len(vectors) != len(batch):
+            raise ValueError(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+        results[start:start + len(batch)] = vectors
+        if on_batch:
+            on_batch(batch, vectors)
+        done += len(batch)
+        if progress:
+            progress(done, len(texts))
+
+    if len(batches) == 1 or max_workers <= 1:
+        for start, batch in batches:
+            finish(start, batch, embed_with_retry(embed_fn, batch, max_retries))
+        return results
+
+    error = None
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+        futures = {
+            pool.submit(embed_with_retry, embed_fn, batch, max_retries): (start, batch)
+            for start, batch in batches
+        }
+        for future in as_completed(futures):
+            start, batch = futures[future]
+            try:
+                finish(start, batch, future.result())
+            except Exception as e:
+                if error is None:
+                    error = e
+                    # Stop queued batches; running ones finish and are checkpointed
+                    for pending in futures:
+                        pending.cancel()
+    if error is not None:
+        raise error
+    return results
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic local embedding backend for tests and benchmarks.
+
+    Vectors are derived from a hash of the text, so identical texts embed
+    identically. ``latency`` adds a per-call delay and ``failure_rate`` makes
+    a fraction of calls raise a 429-style error to exercise retries.
+    """
+
+    def __init__(self, dim=768, latency=0.0, failure_rate=0.0, seed=None):
+        self.dim = dim
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _vector(self, text):
+        values = []
+        counter = 0
+        while len(values) < self.dim:
+            digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+            values.extend(b / 127.5 - 1.0 for b in digest)
+            counter += 1
+        values = values[:self.dim]
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        return [v / norm for v in values]
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise RuntimeError("429 Resource has been exhausted (fake backend)")
+
+    def embed_documents(self, texts):
+        self._call()
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self._call()
+        return self._vector(text)
@@ -1,19 +1,13 @@
 import streamlit as st
-import google.generativeai as genai
-from dotenv import load_dotenv
-import os
-
-# Load environment variables
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+import llm_gateway
 
 # Mock helper functions (these exist in app.py)
 def get_gemini_response(prompt):
     """Mock function - real one exists in app.py"""
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        return response.text
+        return llm_gateway.generate_text(prompt, feature="guided_labs")
+    except llm_gateway.BudgetExceeded:
+        return llm_gateway.BUDGET_MESSAGE
     except Exception as e:
         return f"AI response error: {str(e)}"
 
@@ -89,6 +83,8 @@ GUIDED_LABS = {
     }
 }
 
+# Lab interactions rerun only the lab, not the rest of the app
+@st.fragment
 def show_guided_labs():
     """Main function to display guided labs interface"""
     
@@ -1,13 +1,9 @@
 # image_processor.py
-import google.generativeai as genai
-import os
 import streamlit as st
-from PIL import Image
 import re
-from dotenv import load_dotenv
 
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+import llm_gateway
+import tracing
 
 def extract_text_from_image(image):
     """
@@ -18,17 +14,16 @@ def extract_text_from_image(image):
         if image.mode != 'RGB':
             image = image.convert('RGB')
         
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
         prompt = """
         Extract the chemistry question from this image. Return ONLY the text of the question exactly as it appears.
         If there are multiple questions, extract the main one. Preserve any chemical formulas, equations, or special notation.
         Include ALL multiple choice options if present.
         """
         
-        response = model.generate_content([prompt, image])
-        return response.text.strip()
+        return llm_gateway.generate_text([prompt, image], feature="image_ocr").strip()
     
+    except llm_gateway.BudgetExceeded:
+        raise
     except Exception as e:
         st.error(f"Error extracting text from image: {str(e)}")
         return None
@@ -95,7 +90,8 @@ def get_enhanced_teacher_answer(question_text):
     Get enhanced step-by-step explanation that understands question type
     """
     # Analyze question type
-    question_type = analyze_question_type(question_text)
+    with tracing.span("screenshot.classify"):
+        question_type = analyze_question_type(question_text)
     
     if question_type == "MCQ":
         options = extract_mcq_options(question_text)
@@ -176,9 +172,7 @@ def get_enhanced_teacher_answer(question_text):
         සාරාංශය: [Summary]
         """
     
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    response = model.generate_content(prompt)
-    return response.text.strip()
+    return llm_gateway.generate_text(prompt, feature="image_teacher").strip()
 
 def get_answer_from_question(question_text, teacher_mode=False):
     """
@@ -191,13 +185,17 @@ def get_answer_from_question(question_text, teacher_mode=False):
         from app import process_question
         return process_question(question_text)
 
+@tracing.traced("screenshot.total")
 def process_screenshot(image, teacher_mode=False):
     """
     Main function to process screenshot and return answer
     """
     # Step 1: Extract text from image
-    with st.spinner("📖 Reading question from image..."):
-        question_text = extract_text_from_image(image)
+    try:
+        with st.spinner("📖 Reading question from image..."), tracing.span("screenshot.ocr"):
+            question_text = extract_text_from_image(image)
+    except llm_gateway.BudgetExceeded:
+        return llm_gateway.BUDGET_MESSAGE
     
     if not question_text:
         return "Could not read the question from the image. Please try again with a clearer image."
@@ -218,7 +216,10 @@ def process_screenshot(image, teacher_mode=False):
         st.info(f"**Question Type:** {question_type}")
     
     # Step 2: Get answer
-    with st.spinner("🧠 Analyzing and preparing answer..."):
-        answer = get_answer_from_question(question_text, teacher_mode)
+    try:
+        with st.spinner("🧠 Analyzing and preparing answer..."), tracing.span("screenshot.answer"):
+            answer = get_answer_from_question(question_text, teacher_mode)
+    except llm_gateway.BudgetExceeded:
+        return llm_gateway.BUDGET_MESSAGE
     
     return answer
\ No newline at end of file
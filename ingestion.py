@@ -0,0 +1,229 @@
+# ingestion.py
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from langchain_community.vectorstores import FAISS
+
+from answer_cache import get_answer_cache
+from ann_index import decompress, describe, maybe_compress
+from lexical_index import BM25Index
+from vector_store import INDEX_DIR, registry, get_embeddings, prune_namespaces, read_index_version
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+EMBED_FLUSH_SIZE = int(os.getenv("EMBED_FLUSH_SIZE", "256"))
+
+_ingest_locks = {}
+_ingest_locks_guard = threading.Lock()
+
+
+def content_hash(data):
+    """Return the SHA-256 hex digest of bytes or text"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_bytes(pdf):
+    """Read the raw bytes of an uploaded file without consuming it"""
+    if hasattr(pdf, "getvalue"):
+        return pdf.getvalue()
+    data = pdf.read()
+    pdf.seek(0)
+    return data
+
+
+def load_manifest(index_dir=INDEX_DIR):
+    """Load the document/chunk manifest stored next to an index"""
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"documents": {}, "chunks": {}}
+
+
+def save_manifest(manifest, index_dir=INDEX_DIR):
+    """Atomically write the manifest next to an index"""
+    os.makedirs(index_dir, exist_ok=True)
+    tmp_path = os.path.join(index_dir, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(index_dir, MANIFEST_FILE))
+
+
+def _load_private_copy(index_dir):
+    """Load an index for mutation without touching the copy searches are using"""
+    if read_index_version(index_dir) is None:
+        return None
+    return FAISS.load_local(index_dir, get_embeddings(), allow_dangerous_deserialization=True)
+
+
+def ingest_documents(pdf_docs, iter_chunks, index_dir=INDEX_DIR, progress=None, uploader=None):
+    """Bring an index in line with the uploaded documents, embedding only new chunks.
+
+    Documents are keyed by a hash of their bytes and chunks by a hash of their
+    text. Unchanged documents are not re-extracted, chunks already in the index
+    are not re-embedded, and documents that are no longer uploaded have their
+    chunks removed. ``iter_chunks(pdfs)`` yields (pdf, chunk) pairs for the
+    new documents; they are embedded in batches of ``EMBED_FLUSH_SIZE`` as
+    they arrive so the whole corpus is never held in memory. ``progress``
+    receives short status strings while chunks are embedded.
+
+    In an index several people add to, pass ``uploader``: each document then
+    records who uploaded it, and an upload only withdraws that uploader's own
+    documents. A document is removed once nobody who uploaded it still does.
+    """
+    removed = prune_namespaces()
+    with _ingest_locks_guard:
+        for stale in removed:
+            lock = _ingest_locks.get(stale)
+            if lock is not None and not lock.locked():
+                del _ingest_locks[stale]
+        ingest_lock = _ingest_locks.setdefault(index_dir, threading.Lock())
+
+    with ingest_lock:
+        manifest = load_manifest(index_dir)
+        store = _load_private_copy(index_dir) if manifest["documents"] else None
+        if store is None:
+            # No manifest means we cannot tell what is in the index, so start over
+            manifest = {"documents": {}, "chunks": {}}
+
+        summary = {
+            "added_documents": 0,
+            "skipped_documents": 0,
+            "removed_documents": 0,
+            "embedded_chunks": 0,
+            "reused_chunks": 0,
+            "deleted_chunks": 0,
+        }
+
+        uploaded = {}
+        for pdf in pdf_docs:
+            uploaded.setdefault(content_hash(_file_bytes(pdf)), pdf)
+
+        # Drop documents that are no longer uploaded
+        orphaned = []
+        uploaders_changed = False
+        for doc_hash in [h for h in manifest["documents"] if h not in uploaded]:
+            if uploader is not None:
+                uploaders = manifest["documents"][doc_hash].get("uploaders", [])
+                if uploader not in uploaders:
+                    # Someone else's document, or one added before uploaders were recorded
+                    continue
+                uploaders.remove(uploader)
+                uploaders_changed = True
+                if uploaders:
+                    continue
+            doc = manifest["documents"].pop(doc_hash)
+            for chunk_id in doc["chunk_ids"]:
+                owners = manifest["chunks"].get(chunk_id, [])
+                if doc_hash in owners:
+                    owners.remove(doc_hash)
+                if not owners:
+                    manifest["chunks"].pop(chunk_id, None)
+                    orphaned.append(chunk_id)
+            summary["removed_documents"] += 1
+        if orphaned and store is not None:
+            decompress(store, get_embeddings())
+            store.delete(orphaned)
+            summary["deleted_chunks"] = len(orphaned)
+
+        # Add documents we have not seen before
+        new_docs = {}
+        for doc_hash, pdf in uploaded.items():
+            if doc_hash in manifest["documents"]:
+                summary["skipped_documents"] += 1
+                uploaders = manifest["documents"][doc_hash].setdefault("uploaders", [])
+                if uploader is not None and uploader not in uploaders:
+                    uploaders.append(uploader)
+                    uploaders_changed = True
+            else:
+                new_docs[id(pdf)] = (doc_hash, getattr(pdf, "name", doc_hash[:12]))
+                manifest["documents"][doc_hash] = {
+                    "name": new_docs[id(pdf)][1],
+                    "chunk_ids": [],
+                    "uploaders": [uploader] if uploader is not None else [],
+                }
+                summary["added_documents"] += 1
+
+        pending = {"texts": [], "ids": [], "metadatas": []}
+
+        def report(done, total):
+            if progress:
+                embedded = summary["embedded_chunks"]
+                progress(f"Embedding chunks: {embedded + done}/{embedded + total}")
+
+        def flush():
+            nonlocal store
+            if not pending["texts"]:
+                return
+            embeddings = get_embeddings()
+            vectors = embeddings.embed_documents(pending["texts"], progress=report)
+            text_embeddings = list(zip(pending["texts"], vectors))
+            if store is None:
+                store = FAISS.from_embeddings(
+                    text_embeddings, embeddings,
+                    metadatas=pending["metadatas"], ids=pending["ids"]
+                )
+            else:
+                store.add_embeddings(text_embeddings, metadatas=pending["metadatas"], ids=pending["ids"])
+            summary["embedded_chunks"] += len(pending["texts"])
+            pending.update(texts=[], ids=[], metadatas=[])
+
+        if new_docs:
+            for pdf, chunk in iter_chunks([uploaded[h] for h, _ in new_docs.values()]):
+                doc_hash, name = new_docs[id(pdf)]
+                chunk_ids = manifest["documents"][doc_hash]["chunk_ids"]
+                chunk_id = content_hash(chunk.strip())
+                if chunk_id in chunk_ids:
+                    continue
+                chunk_ids.append(chunk_id)
+
+                owners = manifest["chunks"].setdefault(chunk_id, [])
+                if owners:
+                    summary["reused_chunks"] += 1
+                else:
+                    pending["texts"].append(chunk)
+                    pending["ids"].append(chunk_id)
+                    pending["metadatas"].append({"source": name, "chunk_id": chunk_id})
+                owners.append(doc_hash)
+
+                if len(pending["texts"]) >= EMBED_FLUSH_SIZE:
+                    flush()
+            flush()
+
+        changed = summary["added_documents"] or summary["removed_documents"]
+        if store is not None and changed:
+            manifest["ann_trained_vectors"] = maybe_compress(store, get_embeddings(),
+                                                             manifest.get("ann_trained_vectors"))
+            # Written before the new version is published, so the next reload picks both up together
+            BM25Index.build(corpus_items(store)).save(index_dir)
+            version = registry.save(store, index_dir)
+            save_manifest(manifest, index_dir)
+            get_answer_cache().invalidate(index_dir, keep_version=version)
+        elif uploaders_changed:
+            # The index is unchanged; only who holds which document is
+            save_manifest(manifest, index_dir)
+        summary["index_type"] = describe(store.index) if store is not None else None
+
+        summary["chunks"] = corpus_chunks(store)
+        logger.info("Ingestion summary for %s: %s", index_dir,
+                    {k: v for k, v in summary.items() if k != "chunks"})
+        return summary
+
+
+def corpus_items(store):
+    """Yield (chunk_id, text) for every chunk currently in an index"""
+    for doc_id in store.index_to_docstore_id.values():
+        yield doc_id, store.docstore.search(doc_id).page_content
+
+
+def corpus_chunks(store):
+    """Return the text of every chunk currently in an index"""
+    if store is None:
+        return []
+    return [text for _, text in corpus_items(store)]
@@ -1,12 +1,13 @@
 # iupac_nomenclature.py
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from peft import PeftModel
-import torch
-import google.generativeai as genai
-from transformers import BitsAndBytesConfig
+import llm_gateway
 
 # Load fine-tuned DeepSeek model with quantization
 def load_iupac_model():
+    # torch, transformers and peft take seconds and gigabytes to import; only pay when the model is used
+    import torch
+    from peft import PeftModel
+    from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
+
     base_model_name = "deepseek-ai/deepseek-llm-r1-7b-base"  # Base model
     adapter_path = "C:\\GeminiBot\\checkpoint-250"  # Your adapter path
     
@@ -35,6 +36,8 @@ def load_iupac_model():
 
 # Generate IUPAC response with DeepSeek
 def get_iupac_response(question, tokenizer, model):
+    import torch
+
     # Set model to evaluation mode
     model.eval()
     
@@ -62,7 +65,5 @@ def get_iupac_response(question, tokenizer, model):
 
 # Translate to Sinhala using Gemini
 def translate_to_sinhala(text):
-    model = genai.GenerativeModel('gemini-1.5-flash')
     prompt = f"Translate this chemistry-related text to Sinhala: {text}"
-    response = model.generate_content(prompt)
-    return response.text.strip()
\ No newline at end of file
+    return llm_gateway.generate_text(prompt, model="gemini-1.5-flash", feature="iupac_translation").strip()
\ No newline at end of file
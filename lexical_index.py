@@ -0,0 +1,131 @@
+# lexical_index.py
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+
+LEXICAL_FILE = "lexical.json"
+BM25_K1 = 1.5
+BM25_B = 0.75
+MAX_CACHED = int(os.getenv("MAX_MAPPED_INDEXES", "256"))
+# A lexical result is trusted on its own when its coverage and lead over the runner-up pass these
+LEXICAL_MIN_COVERAGE = float(os.getenv("LEXICAL_MIN_COVERAGE", "0.9"))
+LEXICAL_MIN_MARGIN = float(os.getenv("LEXICAL_MIN_MARGIN", "1.2"))
+
+# Word characters plus the Sinhala block (its vowel signs are combining marks, which \w skips)
+# and the zero-width joiner used in Sinhala conjuncts
+TOKEN_PATTERN = re.compile(r"[\w\u0D80-\u0DFF\u200D]+")
+
+
+def tokenize(text):
+    """Split text into lowercase terms, keeping formulas like KMnO4 and Sinhala words whole"""
+    # NFKC folds subscript digits (H₂O -> H2O) so formulas match however they are typed
+    text = unicodedata.normalize("NFKC", text).lower()
+    return [t.strip("\u200d") for t in TOKEN_PATTERN.findall(text) if t.strip("\u200d_")]
+
+
+class BM25Index:
+    """Okapi BM25 inverted index over chunk texts, keyed by chunk id"""
+
+    def __init__(self, doc_ids, doc_lengths, postings):
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.postings = postings
+        self.avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+
+    @classmethod
+    def build(cls, items):
+        """Build an index from (chunk_id, text) pairs"""
+        doc_ids, doc_lengths, postings = [], [], {}
+        for doc_idx, (chunk_id, text) in enumerate(items):
+            terms = tokenize(text)
+            doc_ids.append(chunk_id)
+            doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, []).append([doc_idx, tf])
+        return cls(doc_ids, doc_lengths, postings)
+
+    def save(self, index_dir):
+        os.makedirs(index_dir, exist_ok=True)
+        tmp_path = os.path.join(index_dir, LEXICAL_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"doc_ids": self.doc_ids, "doc_lengths": self.doc_lengths,
+                       "postings": self.postings}, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(index_dir, LEXICAL_FILE))
+
+    @classmethod
+    def load(cls, index_dir):
+        with open(os.path.join(index_dir, LEXICAL_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["doc_ids"], data["doc_lengths"], data["postings"])
+
+    def search(self, query, k=4):
+        """Return [(chunk_id, score, coverage)] for the top k chunks.
+
+        ``coverage`` is the IDF-weighted fraction of query terms found in the
+        chunk, so missing a rare term like "KMnO4" counts for more than
+        missing "what". Terms absent from the corpus get the maximum IDF.
+        """
+        terms = set(tokenize(query))
+        if not terms or not self.doc_ids:
+            return []
+
+        n = len(self.doc_ids)
+        max_idf = math.log(1 + (n + 0.5) / 0.5)
+        total_idf = 0.0
+        scores = {}
+        matched = Counter()
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                total_idf += max_idf
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            total_idf += idf
+            for doc_idx, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_idx] / self.avg_length)
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+                matched[doc_idx] += idf
+
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.doc_ids[i], score, matched[i] / total_idf if total_idf else 0.0)
+                for i, score in top]
+
+
+def is_confident(hits, min_coverage=LEXICAL_MIN_COVERAGE, min_margin=LEXICAL_MIN_MARGIN):
+    """Return True if the top lexical hit is strong enough to skip vector search"""
+    if not hits:
+        return False
+    _, top_score, coverage = hits[0]
+    if coverage < min_coverage:
+        return False
+    return len(hits) == 1 or top_score >= min_margin * hits[1][1]
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_lexical_index(index_dir, version):
+    """Return the BM25 index for an index directory version, or None if there is none"""
+    key = (index_dir, version)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    try:
+        index = BM25Index.load(index_dir)
+    except FileNotFoundError:
+        index = None
+
+    with _cache_lock:
+        for stale in [k for k in _cache if k[0] == index_dir]:
+            del _cache[stale]
+        _cache[key] = index
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+    return index
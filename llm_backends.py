@@ -0,0 +1,328 @@
+# llm_backends.py
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# "google" calls Gemini, "record" calls Gemini and saves every response, "replay" serves
+# saved responses by prompt hash and "synthetic" makes up well-formed answers offline
+LLM_BACKEND = os.getenv("LLM_BACKEND", "google")
+CASSETTE_DIR = os.getenv("LLM_CASSETTE_DIR", os.path.join(".cache", "cassettes"))
+# What replay does when a prompt was never recorded: "" raises, "synthetic" makes one up
+REPLAY_FALLBACK = os.getenv("LLM_REPLAY_FALLBACK", "")
+# Replay with the recorded timing instead of instantly
+REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "0") == "1"
+# "fixed:MS", "uniform:LO_MS:HI_MS" or "lognormal:MEDIAN_MS:SIGMA"
+SYNTHETIC_LATENCY = os.getenv("LLM_SYNTHETIC_LATENCY", "lognormal:800:0.4")
+# Share of the synthetic latency spent before the first streamed chunk
+SYNTHETIC_FIRST_TOKEN_SHARE = 0.3
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode for a prompt that has no recorded response"""
+
+
+def _part_bytes(part):
+    if isinstance(part, str):
+        return part.encode("utf-8")
+    if isinstance(part, bytes):
+        return part
+    if hasattr(part, "tobytes") and hasattr(part, "size"):
+        # PIL images: hash the pixels, not the object identity
+        return f"{getattr(part, 'mode', '')}{part.size}".encode() + part.tobytes()
+    return repr(part).encode("utf-8")
+
+
+def prompt_key(prompt, model, temperature):
+    """Stable hash of everything that determines a response"""
+    digest = hashlib.sha256(f"{model}\x1f{temperature}\x1f".encode())
+    for part in prompt if isinstance(prompt, (list, tuple)) else [prompt]:
+        digest.update(_part_bytes(part))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def prompt_text(prompt):
+    parts = prompt if isinstance(prompt, (list, tuple)) else [prompt]
+    return "\n".join(p if isinstance(p, str) else f"<{type(p).__name__}>" for p in parts)
+
+
+class CassetteStore:
+    """Recorded responses, one JSON file per prompt hash.
+
+    Files are small and human-readable so a cassette directory can be
+    reviewed and shared for benchmarks run on other machines.
+    """
+
+    def __init__(self, root=CASSETTE_DIR):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def load(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, key, record):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+
+
+def _usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    return (getattr(usage, "prompt_token_count", 0) or 0,
+            getattr(usage, "candidates_token_count", 0) or 0)
+
+
+class GeminiBackend:
+    """Calls Gemini through google-generativeai, configured once per process"""
+
+    name = "google"
+    rate_limited = True
+
+    def __init__(self):
+        self._configured = False
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get_model(self, model):
+        """Return the shared GenerativeModel for a model name"""
+        import google.generativeai as genai
+
+        with self._lock:
+            if not self._configured:
+                from dotenv import load_dotenv
+
+                load_dotenv()
+                genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+                self._configured = True
+            if model not in self._models:
+                self._models[model] = genai.GenerativeModel(model)
+            return self._models[model]
+
+    @staticmethod
+    def _config(temperature):
+        import google.generativeai as genai
+
+        return None if temperature is None else genai.GenerationConfig(temperature=temperature)
+
+    def generate(self, prompt, model, temperature, timeout, feature):
+        response = self.get_model(model).generate_content(
+            prompt, generation_config=self._config(temperature), request_options={"timeout": timeout}
+        )
+        return (response.text, *_usage(response))
+
+    def stream(self, prompt, model, temperature, timeout, feature, usage):
+        response = self.get_model(model).generate_content(
+            prompt, generation_config=self._config(temperature), request_options={"timeout": timeout},
+            stream=True,
+        )
+        for chunk in response:
+            if chunk.parts:
+                yield chunk.text
+        usage["prompt_tokens"], usage["output_tokens"] = _usage(response)
+
+
+class RecordingBackend:
+    """Passes calls through to another backend and saves every response to a cassette"""
+
+    rate_limited = True
+
+    def __init__(self, inner, store):
+        self.inner = inner
+        self.store = store
+        self.name = f"record:{inner.name}"
+
+    def _save(self, prompt, model, temperature, feature, chunks, chunk_ms, prompt_tokens, output_tokens):
+        self.store.save(prompt_key(prompt, model, temperature), {
+            "model": model, "temperature": temperature, "feature": feature,
+            "prompt": prompt_text(prompt), "text": "".join(chunks), "chunks": chunks,
+            "chunk_ms": chunk_ms, "prompt_tokens": prompt_tokens, "output_tokens": output_tokens,
+        })
+
+    def generate(self, prompt, model, temperature, timeout, feature):
+        started = time.perf_counter()
+        text, prompt_tokens, output_tokens = self.inner.generate(prompt, model, temperature, timeout, feature)
+        self._save(prompt, model, temperature, feature, [text],
+                   [(time.perf_counter() - started) * 1000], prompt_tokens, output_tokens)
+        return text, prompt_tokens, output_tokens
+
+    def stream(self, prompt, model, temperature, timeout, feature, usage):
+        started = time.perf_counter()
+        chunks, chunk_ms = [], []
+        for chunk in self.inner.stream(prompt, model, temperature, timeout, feature, usage):
+            chunks.append(chunk)
+            chunk_ms.append((time.perf_counter() - started) * 1000)
+            yield chunk
+        self._save(prompt, model, temperature, feature, chunks, chunk_ms,
+                   usage.get("prompt_tokens", 0), usage.get("output_tokens", 0))
+
+
+class ReplayBackend:
+    """Serves recorded responses by prompt hash without touching the network"""
+
+    name = "replay"
+    rate_limited = False
+
+    def __init__(self, store, fallback=None, replay_latency=REPLAY_LATENCY):
+        self.store = store
+        self.fallback = fallback
+        self.replay_latency = replay_latency
+
+    def _record(self, prompt, model, temperature):
+        record = self.store.load(prompt_key(prompt, model, temperature))
+        if record is None and self.fallback is None:
+            raise CassetteMiss(f"No recorded response for {model} prompt: {prompt_text(prompt)[:80]!r}")
+        return record
+
+    def generate(self, prompt, model, temperature, timeout, feature):
+        record = self._record(prompt, model, temperature)
+        if record is None:
+            return self.fallback.generate(prompt, model, temperature, timeout, feature)
+        if self.replay_latency and record.get("chunk_ms"):
+            time.sleep(record["chunk_ms"][-1] / 1000)
+        return record["text"], record.get("prompt_tokens", 0), record.get("output_tokens", 0)
+
+    def stream(self, prompt, model, temperature, timeout, feature, usage):
+        record = self._record(prompt, model, temperature)
+        if record is None:
+            yield from self.fallback.stream(prompt, model, temperature, timeout, feature, usage)
+            return
+        elapsed = 0.0
+        for chunk, at_ms in zip(record["chunks"], record.get("chunk_ms") or [0.0] * len(record["chunks"])):
+            if self.replay_latency and at_ms > elapsed:
+                time.sleep((at_ms - elapsed) / 1000)
+                elapsed = at_ms
+            yield chunk
+        usage["prompt_tokens"] = record.get("prompt_tokens", 0)
+        usage["output_tokens"] = record.get("output_tokens", 0)
+
+
+class LatencyModel:
+    """Samples call latencies in seconds from a spec such as "lognormal:800:0.4" """
+
+    def __init__(self, spec=SYNTHETIC_LATENCY):
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng):
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(self.params[0], self.params[1])
+        else:
+            ms = self.params[0] * math.exp(rng.gauss(0.0, self.params[1]))
+        return max(0.0, ms) / 1000
+
+
+SINHALA_SENTENCES = [
+    "රසායනික බන්ධන පරමාණු අතර ඉලෙක්ට්‍රෝන හුවමාරුව හෝ බෙදාගැනීම මගින් සෑදේ.",
+    "ප්‍රතික්‍රියාවේ ශීඝ්‍රතාව උෂ්ණත්වය සහ සාන්ද්‍රණය මත රඳා පවතී.",
+    "H₂O අණුවේ හැඩය කෝණික වන අතර බන්ධන කෝණය 104.5° පමණ වේ.",
+    "අම්ලයක pH අගය 7 ට වඩා අඩු වේ.",
+    "කාබන් පරමාණුවට සහසංයුජ බන්ධන හතරක් සෑදිය හැක.",
+]
+SMILES = ["CCO", "CC(=O)O", "c1ccccc1", "C=C", "O=C=O", "CC(C)O", "C1CCCCC1"]
+
+
+class SyntheticBackend:
+    """Makes up well-formed answers with sampled latency, for profiling without a network.
+
+    Answers are deterministic for a prompt and follow the format each
+    feature parses: "Q:: ... | A:: ..." lines for quizzes and exams, a bare
+    SMILES string for name lookups, and so on.
+    """
+
+    name = "synthetic"
+    rate_limited = False
+
+    def __init__(self, latency=None, seed=0):
+        self.latency = latency or LatencyModel()
+        self.seed = seed
+
+    def _rng(self, prompt, model, temperature):
+        return random.Random(f"{self.seed}:{prompt_key(prompt, model, temperature)}")
+
+    def _answer(self, prompt, feature, rng):
+        text = prompt_text(prompt)
+        if feature in ("quiz", "mock_exam"):
+            match = re.search(r"Generate (\d+)", text)
+            count = max(1, int(match.group(1))) if match else 3
+            return "\n".join(
+                f"Q:: {rng.choice(SINHALA_SENTENCES)} ({i + 1}) | A:: {rng.choice(SMILES)} | "
+                f"B:: {rng.choice(SMILES)} | C:: {rng.choice(SMILES)} | D:: {rng.choice(SMILES)}"
+                for i in range(count)
+            )
+        if feature == "smiles":
+            return rng.choice(SMILES)
+        if feature == "image_ocr":
+            return ("Which of the following is an alkene?\n"
+                    "A. CH4\nB. C2H4\nC. C2H6\nD. C3H8")
+        if feature == "exam_feedback":
+            return ("Assessment: " + rng.choice(SINHALA_SENTENCES) + "\n"
+                    "Weak Areas: Chemical Bonding, Reaction Kinetics\n"
+                    "Revision Tips:\n1. " + rng.choice(SINHALA_SENTENCES) + "\n2. "
+                    + rng.choice(SINHALA_SENTENCES) + "\n3. " + rng.choice(SINHALA_SENTENCES) + "\n"
+                    "Resources: https://www.chemguide.co.uk")
+        if feature in ("teacher", "image_teacher"):
+            steps = [f"පියවර {i + 1}: {rng.choice(SINHALA_SENTENCES)}" for i in range(rng.randint(3, 5))]
+            return "\n".join(steps + [f"සාරාංශය: {rng.choice(SINHALA_SENTENCES)}"])
+        return " ".join(rng.choice(SINHALA_SENTENCES) for _ in range(rng.randint(3, 8)))
+
+    def _usage(self, prompt, text):
+        from tokens import estimate_tokens
+
+        return estimate_tokens(prompt_text(prompt)), estimate_tokens(text)
+
+    def generate(self, prompt, model, temperature, timeout, feature):
+        rng = self._rng(prompt, model, temperature)
+        text = self._answer(prompt, feature, rng)
+        time.sleep(self.latency.sample(rng))
+        return (text, *self._usage(prompt, text))
+
+    def stream(self, prompt, model, temperature, timeout, feature, usage):
+        rng = self._rng(prompt, model, temperature)
+        text = self._answer(prompt, feature, rng)
+        latency = self.latency.sample(rng)
+        words = text.split(" ")
+        chunks = [" ".join(words[i:i + 8]) + (" " if i + 8 < len(words) else "")
+                  for i in range(0, len(words), 8)]
+        time.sleep(latency * SYNTHETIC_FIRST_TOKEN_SHARE)
+        rest = latency * (1 - SYNTHETIC_FIRST_TOKEN_SHARE) / max(1, len(chunks) - 1)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(rest)
+            yield chunk
+        usage["prompt_tokens"], usage["output_tokens"] = self._usage(prompt, text)
+
+
+def create_backend(kind=LLM_BACKEND):
+    """Build the backend selected by LLM_BACKEND"""
+    if kind == "google":
+        return GeminiBackend()
+    if kind == "record":
+        return RecordingBackend(GeminiBackend(), CassetteStore())
+    if kind == "replay":
+        fallback = SyntheticBackend() if REPLAY_FALLBACK == "synthetic" else None
+        return ReplayBackend(CassetteStore(), fallback=fallback)
+    if kind == "synthetic":
+        return SyntheticBackend()
+    raise ValueError(f"Unknown LLM_BACKEND: {kind}")
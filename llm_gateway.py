@@ -0,0 +1,295 @@
+# llm_gateway.py
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from llm_backends import create_backend
+from retry import is_retryable
+from tokens import estimate_tokens
+import tracing
+from usage_ledger import BudgetExceeded, current_session, get_usage_ledger
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20.0"))
+# Calls in flight across every session in the process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Calls started per rolling minute; 0 disables the limiter
+LLM_RPM = int(os.getenv("LLM_RPM", "60"))
+
+# Shown instead of an answer once a session or daily budget is used up
+BUDGET_MESSAGE = (
+    "ඔබගේ AI භාවිත සීමාව ඉක්මවා ඇත. කරුණාකර පසුව නැවත උත්සාහ කරන්න. "
+    "(The AI usage limit has been reached. Please try again later.)"
+)
+
+
+class LLMResult:
+    """Text of a completed call with its latency and token counts.
+
+    Token counts come from the backend when it reports them and
+    are estimated from the text otherwise.
+    """
+
+    def __init__(self, text, model, feature, latency_ms, attempts,
+                 prompt_tokens, output_tokens, first_token_ms=None, error=None, cost=0.0):
+        self.text = text
+        self.model = model
+        self.feature = feature
+        self.latency_ms = latency_ms
+        self.attempts = attempts
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+        self.first_token_ms = first_token_ms
+        self.error = error
+        self.cost = cost
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class RateLimiter:
+    """Blocking limiter allowing at most ``rpm`` calls to start in any 60 second window"""
+
+    def __init__(self, rpm=LLM_RPM, window=60.0):
+        self.rpm = rpm
+        self.window = window
+        self._starts = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rpm <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._starts and now - self._starts[0] >= self.window:
+                    self._starts.popleft()
+                if len(self._starts) < self.rpm:
+                    self._starts.append(now)
+                    return waited
+                delay = self.window - (now - self._starts[0])
+            time.sleep(delay)
+            waited += delay
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+_limiter = RateLimiter()
+_stats = {"calls": 0, "errors": 0, "retries": 0, "prompt_tokens": 0, "output_tokens": 0,
+          "cost": 0.0, "over_budget": 0, "total_ms": 0.0, "queued_ms": 0.0, "by_feature": {}}
+_stats_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the process-wide backend chosen by LLM_BACKEND (see llm_backends)"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+            logger.info("LLM backend: %s", _backend.name)
+        return _backend
+
+
+def set_backend(backend):
+    """Swap the backend, e.g. to a SyntheticBackend with a custom latency model in a harness"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+@contextmanager
+def _slot(backend):
+    """Wait for the rate limiter and a concurrency slot; yields the time spent queued in ms"""
+    started = time.perf_counter()
+    # Offline backends spend no quota, so only the concurrency limit applies to them
+    if backend.rate_limited:
+        _limiter.acquire()
+    with _slots:
+        yield (time.perf_counter() - started) * 1000
+
+
+def _usage(prompt, text, prompt_tokens, output_tokens):
+    """Fill in token counts the backend did not report with estimates"""
+    if not prompt_tokens:
+        parts = prompt if isinstance(prompt, (list, tuple)) else [prompt]
+        prompt_tokens = sum(estimate_tokens(p) for p in parts if isinstance(p, str))
+    return prompt_tokens, output_tokens or estimate_tokens(text)
+
+
+def _backoff(attempt):
+    return min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def _record(result, queued_ms=0.0):
+    tracing.observe(f"llm.{result.feature}", result.latency_ms / 1000)
+    tracing.observe("llm.queue", queued_ms / 1000)
+    try:
+        result.cost = get_usage_ledger().record(result, current_session(), tracing.current_request_id())
+    except Exception as e:
+        # Accounting must never take an answer away from a student
+        logger.warning("Could not record LLM usage: %s", e)
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["errors"] += result.error is not None
+        _stats["retries"] += max(0, result.attempts - 1)
+        _stats["prompt_tokens"] += result.prompt_tokens
+        _stats["output_tokens"] += result.output_tokens
+        _stats["cost"] += result.cost
+        _stats["total_ms"] += result.latency_ms
+        _stats["queued_ms"] += queued_ms
+        feature = _stats["by_feature"].setdefault(result.feature,
+                                                  {"calls": 0, "tokens": 0, "cost": 0.0, "total_ms": 0.0})
+        feature["calls"] += 1
+        feature["tokens"] += result.prompt_tokens + result.output_tokens
+        feature["cost"] += result.cost
+        feature["total_ms"] += result.latency_ms
+    logger.info("[%s] LLM %s [%s] %.0f ms, %d attempt(s), %d prompt + %d output tokens, $%.5f%s",
+                tracing.current_request_id(), result.model, result.feature, result.latency_ms, result.attempts,
+                result.prompt_tokens, result.output_tokens, result.cost,
+                f", failed: {result.error}" if result.error else "")
+
+
+def _check_budget(feature):
+    try:
+        get_usage_ledger().check_budget(current_session())
+    except BudgetExceeded as e:
+        with _stats_lock:
+            _stats["over_budget"] += 1
+        logger.warning("[%s] LLM call for %s refused: %s", tracing.current_request_id(), feature, e)
+        raise
+
+
+def generate(prompt, model=DEFAULT_MODEL, temperature=None, feature="general",
+             timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES):
+    """Run one Gemini call and return an LLMResult.
+
+    ``prompt`` is anything ``generate_content`` accepts, such as a string or
+    a [text, image] list. Transient failures are retried with jittered
+    exponential backoff; the last error is raised once retries run out.
+    BudgetExceeded is raised without calling the model once the session or
+    daily budget is spent.
+    """
+    _check_budget(feature)
+    backend = get_backend()
+    with _slot(backend) as queued_ms:
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                text, prompt_tokens, output_tokens = backend.generate(prompt, model, temperature, timeout, feature)
+                break
+            except Exception as e:
+                if attempt > max_retries or not is_retryable(e):
+                    _record(LLMResult("", model, feature, (time.perf_counter() - started) * 1000,
+                                      attempt, 0, 0, error=str(e)), queued_ms)
+                    raise
+                delay = _backoff(attempt - 1)
+                logger.warning("LLM call failed (%s); retry %d/%d in %.1f s", e, attempt, max_retries, delay)
+                time.sleep(delay)
+
+    prompt_tokens, output_tokens = _usage(prompt, text, prompt_tokens, output_tokens)
+    latency_ms = (time.perf_counter() - started) * 1000
+    result = LLMResult(text, model, feature, latency_ms, attempt, prompt_tokens, output_tokens,
+                       first_token_ms=latency_ms)
+    _record(result, queued_ms)
+    return result
+
+
+def stream(prompt, model=DEFAULT_MODEL, temperature=None, feature="general",
+           timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES, on_complete=None):
+    """Yield the text of a Gemini call as it is generated.
+
+    Retries only happen before the first chunk arrives, since text already
+    shown cannot be taken back. ``on_complete(result)`` receives the
+    LLMResult once the stream is finished; a stream that fails or is closed
+    early is still recorded, with the text so far and its error set (to
+    "interrupted" when closed). BudgetExceeded is raised before the first
+    chunk once the session or daily budget is spent.
+    """
+    _check_budget(feature)
+    backend = get_backend()
+    with _slot(backend) as queued_ms:
+        started = time.perf_counter()
+        attempt = 0
+        first_token_ms = None
+        parts = []
+        usage = {}
+        # Stays set unless the stream finishes; a rerun or stop closes the generator mid-answer
+        error = "interrupted"
+        try:
+            while True:
+                attempt += 1
+                try:
+                    for chunk in backend.stream(prompt, model, temperature, timeout, feature, usage):
+                        if first_token_ms is None:
+                            first_token_ms = (time.perf_counter() - started) * 1000
+                        parts.append(chunk)
+                        yield chunk
+                    break
+                except Exception as e:
+                    if parts or attempt > max_retries or not is_retryable(e):
+                        raise
+                    delay = _backoff(attempt - 1)
+                    logger.warning("LLM stream failed (%s); retry %d/%d in %.1f s",
+                                   e, attempt, max_retries, delay)
+                    time.sleep(delay)
+            error = None
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            # Text already streamed was generated, and billed, even if the stream did not finish
+            text = "".join(parts)
+            prompt_tokens, output_tokens = (
+                _usage(prompt, text, usage.get("prompt_tokens", 0), usage.get("output_tokens", 0))
+                if parts or error is None else (0, 0)
+            )
+            result = LLMResult(text, model, feature, (time.perf_counter() - started) * 1000, attempt,
+                               prompt_tokens, output_tokens, first_token_ms, error=error)
+            _record(result, queued_ms)
+
+    if on_complete:
+        on_complete(result)
+
+
+def generate_text(prompt, **kwargs):
+    """Shortcut for callers that only need the answer text.
+
+    Raises BudgetExceeded like generate(); callers that show the answer
+    show BUDGET_MESSAGE instead, so it is never parsed as model output.
+    """
+    return generate(prompt, **kwargs).text
+
+
+async def agenerate(prompt, **kwargs):
+    """Async generate(); runs on a worker thread so it shares the same limits as sync calls"""
+    return await asyncio.to_thread(generate, prompt, **kwargs)
+
+
+async def agenerate_many(prompts, **kwargs):
+    """Run several prompts concurrently, within the global concurrency and rate limits"""
+    return await asyncio.gather(*(agenerate(prompt, **kwargs) for prompt in prompts))
+
+
+def stats():
+    """Process-wide call statistics"""
+    with _stats_lock:
+        snapshot = dict(_stats)
+        snapshot["by_feature"] = {k: dict(v) for k, v in _stats["by_feature"].items()}
+    calls = snapshot["calls"]
+    snapshot["avg_ms"] = snapshot["total_ms"] / calls if calls else None
+    snapshot["avg_queued_ms"] = snapshot["queued_ms"] / calls if calls else None
+    return snapshot
@@ -1,12 +1,9 @@
 # mock_exams.py
 import streamlit as st
-import google.generativeai as genai
-import os
-from dotenv import load_dotenv
 import random
 
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+import llm_gateway
+import tracing
 
 # Chemistry topics with subtopics
 CHEMISTRY_TOPICS = {
@@ -33,6 +30,7 @@ CHEMISTRY_TOPICS = {
     ]
 }
 
+@tracing.traced("exam.generate")
 def generate_exam_questions(topic, num_questions=5):
     """Generate exam questions for a specific chemistry topic"""
     prompt = f"""
@@ -50,14 +48,14 @@ def generate_exam_questions(topic, num_questions=5):
     5. Keep questions concise (max 2 sentences)
     """
     
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    response = model.generate_content(prompt)
+    response = llm_gateway.generate_text(prompt, feature="mock_exam")
     
-    if response.text:
-        questions = [q.strip() for q in response.text.split('Q:: ') if q.strip()]
+    if response:
+        questions = [q.strip() for q in response.split('Q:: ') if q.strip()]
         return [f'Q:: {q}' for q in questions if '| A:: ' in q][:num_questions]
     return []
 
+@tracing.traced("exam.feedback")
 def analyze_performance(questions, user_answers, correct_answers):
     """Analyze exam performance and provide feedback"""
     # Calculate score
@@ -88,11 +86,11 @@ def analyze_performance(questions, user_answers, correct_answers):
         Resources: [resource links]
         """
         
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        return response.text, score
+        return llm_gateway.generate_text(prompt, feature="exam_feedback"), score
     return "", score
 
+# Answering a question reruns only the exam, not the rest of the app
+@st.fragment
 def show_mock_exams():
     """Display mock exam interface"""
     # Initialize session state
@@ -141,7 +139,11 @@ def show_mock_exams():
             # Generate exam button
             if st.button("📝 Generate Exam", use_container_width=True):
                 with st.spinner("ඔබට අදාළ ප්‍රශ්න සකසමින් පවතී..."):
-                    questions = generate_exam_questions(selected_topic, num_questions=5)
+                    try:
+                        questions = generate_exam_questions(selected_topic, num_questions=5)
+                    except llm_gateway.BudgetExceeded:
+                        st.warning(llm_gateway.BUDGET_MESSAGE)
+                        questions = None
                     if questions:
                         correct_answers = []
                         for q in questions:
@@ -157,7 +159,7 @@ def show_mock_exams():
                             'score': 0
                         }
                         st.success("ප්‍රශ්නාවලිය සැකසීම සාර්ථකය්!")
-                    else:
+                    elif questions is not None:
                         st.error("Failed to generate exam. Please try again.")
             
             st.markdown("</div>", unsafe_allow_html=True)
@@ -194,15 +196,19 @@ def show_mock_exams():
                 submitted = st.form_submit_button("✅ Submit Exam", use_container_width=True)
                 if submitted:
                     with st.spinner("Analyzing your performance..."):
-                        analysis, score = analyze_performance(
-                            st.session_state.exam['questions'],
-                            st.session_state.exam['user_answers'],
-                            st.session_state.exam['correct_answers']
-                        )
-                        st.session_state.exam['analysis'] = analysis
-                        st.session_state.exam['submitted'] = True
-                        st.session_state.exam['score'] = score
-                        st.rerun()
+                        try:
+                            analysis, score = analyze_performance(
+                                st.session_state.exam['questions'],
+                                st.session_state.exam['user_answers'],
+                                st.session_state.exam['correct_answers']
+                            )
+                        except llm_gateway.BudgetExceeded:
+                            st.warning(llm_gateway.BUDGET_MESSAGE)
+                        else:
+                            st.session_state.exam['analysis'] = analysis
+                            st.session_state.exam['submitted'] = True
+                            st.session_state.exam['score'] = score
+                            st.rerun()
             
             st.markdown("</div>", unsafe_allow_html=True)
     
@@ -0,0 +1,105 @@
+# pdf_pipeline.py
+import multiprocessing
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from PyPDF2 import PdfReader
+
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Below this many pages, starting worker processes costs more than it saves
+SERIAL_PAGE_THRESHOLD = int(os.getenv("PDF_SERIAL_PAGE_THRESHOLD", "32"))
+
+
+def _extract_pages(path, start, stop):
+    """Worker: extract the text of pages [start, stop) from a PDF on disk"""
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _spool(pdf, directory):
+    """Write an uploaded file to disk so worker processes can open it by path"""
+    data = pdf.getvalue() if hasattr(pdf, "getvalue") else pdf.read()
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+def iter_pdf_pages(pdf_docs, max_workers=MAX_WORKERS, pages_per_task=PAGES_PER_TASK):
+    """Yield (doc, page_no, text) for every page of every PDF, in order.
+
+    Pages are extracted in a process pool in batches of ``pages_per_task``.
+    At most two batches per worker are in flight, so memory stays bounded no
+    matter how many documents are passed in.
+    """
+    with tempfile.TemporaryDirectory(prefix="pdf_pages_") as tmp_dir:
+        tasks = []
+        for pdf in pdf_docs:
+            path = _spool(pdf, tmp_dir)
+            num_pages = len(PdfReader(path).pages)
+            for start in range(0, num_pages, pages_per_task):
+                tasks.append((pdf, path, start, min(start + pages_per_task, num_pages)))
+
+        total_pages = sum(stop - start for _, _, start, stop in tasks)
+        if max_workers <= 1 or total_pages < SERIAL_PAGE_THRESHOLD:
+            for pdf, path, start, stop in tasks:
+                for offset, text in enumerate(_extract_pages(path, start, stop)):
+                    yield pdf, start + offset + 1, text
+            return
+
+        # Spawned workers avoid forking the Streamlit server's threads
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+            pending = deque()
+            task_iter = iter(tasks)
+
+            def submit_next():
+                task = next(task_iter, None)
+                if task is not None:
+                    pdf, path, start, stop = task
+                    pending.append((pdf, start, pool.submit(_extract_pages, path, start, stop)))
+
+            for _ in range(max_workers * 2):
+                submit_next()
+
+            while pending:
+                pdf, start, future = pending.popleft()
+                texts = future.result()
+                submit_next()
+                for offset, text in enumerate(texts):
+                    yield pdf, start + offset + 1, text
+
+
+def iter_page_chunks(records, split_text, flush_chars=50000):
+    """Turn a stream of (doc, page_no, text) records into (doc, chunk) pairs.
+
+    Page text is buffered per document and split once the buffer passes
+    ``flush_chars``. The last chunk of each split is carried over so chunks
+    can still span page boundaries.
+    """
+    current_doc = None
+    buffer = []
+    size = 0
+
+    for doc, _page_no, text in records:
+        if doc is not current_doc:
+            if current_doc is not None and size:
+                for chunk in split_text("".join(buffer)):
+                    yield current_doc, chunk
+            current_doc, buffer, size = doc, [], 0
+
+        buffer.append(text)
+        size += len(text)
+        if size >= flush_chars:
+            chunks = split_text("".join(buffer))
+            for chunk in chunks[:-1]:
+                yield current_doc, chunk
+            buffer = chunks[-1:]
+            size = sum(len(c) for c in buffer)
+
+    if current_doc is not None and size:
+        for chunk in split_text("".join(buffer)):
+            yield current_doc, chunk
@@ -1,9 +1,6 @@
 import streamlit as st
-import requests
-from io import BytesIO
-from PIL import Image
 
-import google.generativeai as genai
+import llm_gateway
 
 
 # PhET simulation data
@@ -87,15 +84,18 @@ def show_phet_simulations():
         Respond in Sinhala.
         """
         
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(description_prompt)
-        description = response.text.strip()
-        
-        st.session_state.chat_history.append({
-            "role": "assistant", 
-            "content": f"Description of {selected_sim} experiment:\n\n{description}"
-        })
-        speak(description, 'si')
+        try:
+            description = llm_gateway.generate_text(
+                description_prompt, model="gemini-1.5-flash", feature="phet_description"
+            ).strip()
+        except llm_gateway.BudgetExceeded:
+            st.warning(llm_gateway.BUDGET_MESSAGE)
+        else:
+            st.session_state.chat_history.append({
+                "role": "assistant", 
+                "content": f"Description of {selected_sim} experiment:\n\n{description}"
+            })
+            speak(description, 'si')
 
 # For testing purposes
 if __name__ == "__main__":
@@ -0,0 +1,14 @@
+# retry.py
+# Shared by the embedding pipeline and the LLM gateway; kept free of third-party imports
+
+# Substrings of error names/messages that mean "try again later"
+RETRYABLE_MARKERS = (
+    "429", "resourceexhausted", "resource exhausted", "rate limit", "quota",
+    "503", "unavailable", "deadline", "timeout", "timed out",
+)
+
+
+def is_retryable(exc):
+    """Return True for rate-limit and transient service errors"""
+    text = f"{type(exc).__name__} {exc}".lower()
+    return any(marker in text for marker in RETRYABLE_MARKERS)
@@ -1,16 +1,11 @@
 # sinhala_chemistry_teacher.py
-import google.generativeai as genai
-import os
-from dotenv import load_dotenv
+import llm_gateway
 
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-
-def get_step_by_step_answer(user_question):
+def build_teacher_prompt(user_question):
     """
-    Get step-by-step chemistry explanation in Sinhala using Gemini
+    Build the step-by-step teacher prompt for a chemistry question
     """
-    prompt = f"""
+    return f"""
     You are a chemistry teacher specializing in explaining concepts to Sri Lankan students in Sinhala.
     Provide a detailed, step-by-step explanation for the following chemistry question:
     "{user_question}"
@@ -30,7 +25,15 @@ def get_step_by_step_answer(user_question):
     ...
     සාරාංශය: [Summary]
     """
-    
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    response = model.generate_content(prompt)
-    return response.text.strip()
\ No newline at end of file
+
+def stream_step_by_step_answer(user_question):
+    """
+    Yield the step-by-step Sinhala explanation as Gemini generates it
+    """
+    yield from llm_gateway.stream(build_teacher_prompt(user_question), feature="teacher")
+
+def get_step_by_step_answer(user_question):
+    """
+    Get step-by-step chemistry explanation in Sinhala using Gemini
+    """
+    return "".join(stream_step_by_step_answer(user_question)).strip()
\ No newline at end of file
@@ -1,10 +1,9 @@
 # smart_table.py
 import json
 import streamlit as st
-import plotly.express as px
-from gtts import gTTS
-import base64
-from io import BytesIO
+
+from tts import load_clip, synthesize_clip
+import tracing
 
 # Color mapping for element categories
 CATEGORY_COLORS = {
@@ -39,17 +38,14 @@ def describe_element(element):
     return description
 
 def speak(text, language='en'):
-    """Convert text to speech"""
-    tts = gTTS(text=text, lang=language)
-    fp = BytesIO()
-    tts.write_to_fp(fp)
-    fp.seek(0)
-    audio_bytes = fp.read()
-    b64 = base64.b64encode(audio_bytes).decode()
-    return f"data:audio/mp3;base64,{b64}"
+    """Convert text to speech and return its clip ID; session state keeps the ID, not the audio"""
+    with tracing.span("tts.synthesize"):
+        return synthesize_clip(text, language)
 
 def plot_trend(elements, property_name, title):
     """Plot property trend across a period or group"""
+    import plotly.express as px
+
     fig = px.line(
         elements, 
         x='atomicNumber', 
@@ -65,6 +61,8 @@ def plot_trend(elements, property_name, title):
     )
     return fig
 
+# An element click reruns only the table, not the rest of the app
+@st.fragment
 def show_smart_table():
     """Main function to display the smart periodic table"""
     elements = load_element_data()
@@ -318,4 +316,7 @@ def show_smart_table():
     
     # Audio player
     if st.session_state.element_audio:
-        st.audio(st.session_state.element_audio, format='audio/mp3')
\ No newline at end of file
+        # Served from Streamlit's own media endpoint, so it works wherever the app itself is reachable
+        audio = load_clip(st.session_state.element_audio)
+        if audio:
+            st.audio(audio, format='audio/mp3')
\ No newline at end of file
@@ -0,0 +1,33 @@
+# tests/test_chunker.py
+from chunker import is_heading, split_sections, split_text
+
+TEXT = (
+    "ORGANIC CHEMISTRY\n"
+    "1.1 Alkanes\n"
+    "Alkanes are saturated hydrocarbons.\n"
+    "In the experiment, a sample of\n"
+    "0.50 mol of ethane was burnt completely."
+)
+
+
+def test_quantities_at_line_start_are_not_headings():
+    assert not is_heading("0.50 mol of ethane was burnt completely.")
+    assert not is_heading("2.5 g of NaCl was dissolved in water")
+    assert not is_heading("3.1 The reaction is exothermic.")
+    assert is_heading("1.2 Chemical Bonding")
+    assert is_heading("1.3 රසායනික බන්ධන")
+
+
+def test_no_text_is_dropped():
+    chunks = split_text(TEXT)
+    assert "ORGANIC CHEMISTRY" in chunks[0]
+    assert "0.50 mol of ethane was burnt completely." in chunks[-1]
+
+
+def test_consecutive_headings_are_kept_together():
+    sections = split_sections(TEXT)
+    assert sections[0][0] == "ORGANIC CHEMISTRY\n1.1 Alkanes"
+
+
+def test_trailing_heading_is_kept_as_text():
+    assert split_sections("Intro text.\n\nSUMMARY") == [("", ["Intro text."]), ("", ["SUMMARY"])]
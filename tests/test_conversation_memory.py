@@ -0,0 +1,13 @@
+# tests/test_conversation_memory.py
+from conversation_memory import refers_back
+
+
+def test_follow_ups_refer_back():
+    assert refers_back("Explain it again")
+    assert refers_back("ඒක මොකක්ද?")
+    assert refers_back("why?")
+
+
+def test_standalone_questions_do_not():
+    assert not refers_back("How does chlorine react with sodium hydroxide?")
+    assert not refers_back("බෙන්සීන් යනු කුමක්ද?")
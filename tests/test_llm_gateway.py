@@ -0,0 +1,69 @@
+# tests/test_llm_gateway.py
+import pytest
+
+import llm_gateway
+
+
+class ChunkBackend:
+    name = "test"
+    rate_limited = False
+
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+
+    def stream(self, prompt, model, temperature, timeout, feature, usage):
+        for i, chunk in enumerate(self.chunks):
+            if i == self.fail_after:
+                raise ValueError("connection reset")
+            yield chunk
+        usage["prompt_tokens"], usage["output_tokens"] = 10, len(self.chunks)
+
+
+class Ledger:
+    def __init__(self):
+        self.results = []
+
+    def check_budget(self, session):
+        pass
+
+    def record(self, result, session, request_id):
+        self.results.append(result)
+        return 0.0
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    ledger = Ledger()
+    # Restore whatever backend was set before the test swaps it
+    monkeypatch.setattr(llm_gateway, "_backend", llm_gateway._backend)
+    monkeypatch.setattr(llm_gateway, "get_usage_ledger", lambda: ledger)
+    return ledger
+
+
+def test_finished_stream_is_recorded(ledger):
+    llm_gateway.set_backend(ChunkBackend(["a ", "b ", "c"]))
+    assert "".join(llm_gateway.stream("prompt", feature="chat")) == "a b c"
+    [result] = ledger.results
+    assert result.error is None
+    assert (result.prompt_tokens, result.output_tokens) == (10, 3)
+
+
+def test_closed_stream_records_the_text_so_far(ledger):
+    llm_gateway.set_backend(ChunkBackend(["a ", "b ", "c"]))
+    chunks = llm_gateway.stream("prompt", feature="chat")
+    assert next(chunks) == "a "
+    chunks.close()
+    [result] = ledger.results
+    assert result.error == "interrupted"
+    assert result.text == "a "
+    assert result.prompt_tokens > 0 and result.output_tokens > 0
+
+
+def test_failed_stream_records_the_text_so_far(ledger):
+    llm_gateway.set_backend(ChunkBackend(["a ", "b ", "c"], fail_after=2))
+    with pytest.raises(ValueError):
+        list(llm_gateway.stream("prompt", feature="chat"))
+    [result] = ledger.results
+    assert result.error == "connection reset"
+    assert result.text == "a b "
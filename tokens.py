@@ -0,0 +1,18 @@
+# tokens.py
+import re
+
+# Gemini's tokenizer averages about four characters per token for English, but Sinhala
+# script is split much more finely, so non-ASCII characters are weighted more heavily
+ASCII_CHARS_PER_TOKEN = 4.0
+OTHER_CHARS_PER_TOKEN = 1.5
+
+_NON_ASCII = re.compile(r"[^\x00-\x7f]")
+
+
+def estimate_tokens(text):
+    """Estimate the Gemini token count of a string without calling the API"""
+    if not text:
+        return 0
+    other = len(_NON_ASCII.findall(text))
+    ascii_chars = len(text) - other
+    return int(ascii_chars / ASCII_CHARS_PER_TOKEN + other / OTHER_CHARS_PER_TOKEN) + 1
@@ -0,0 +1,198 @@
+# tracing.py
+import bisect
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from cache hits to slow Gemini answers
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Port for the Prometheus text endpoint; 0 disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# JSON snapshot written every METRICS_JSON_INTERVAL seconds; empty disables it
+METRICS_JSON_PATH = os.getenv("METRICS_JSON_PATH", "")
+METRICS_JSON_INTERVAL = float(os.getenv("METRICS_JSON_INTERVAL", "30"))
+
+_request_id = contextvars.ContextVar("request_id", default="-")
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets, like a Prometheus histogram"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Approximate quantile: the upper bound of the bucket holding it"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+def new_request_id():
+    """Start a new request (one Streamlit rerun) and return its ID"""
+    request_id = uuid.uuid4().hex[:12]
+    _request_id.set(request_id)
+    return request_id
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def observe(stage, seconds):
+    """Record a stage duration measured elsewhere, e.g. across a stream"""
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = Histogram()
+        histogram.observe(seconds)
+    logger.debug("[%s] %s %.1f ms", _request_id.get(), stage, seconds * 1000)
+
+
+@contextmanager
+def span(stage):
+    """Time a block and record it under ``stage``, even if it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def traced(stage):
+    """Decorator form of span()"""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def traced_stream(chunks, stage):
+    """Pass a stream through, recording the time from the first pull to exhaustion"""
+    started = time.perf_counter()
+    try:
+        yield from chunks
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def snapshot():
+    """Per-stage histogram summaries"""
+    with _lock:
+        return {stage: h.as_dict() for stage, h in sorted(_histograms.items())}
+
+
+def render_prometheus():
+    """Histograms in the Prometheus text exposition format"""
+    lines = [
+        "# HELP app_stage_duration_seconds Time spent in each pipeline stage",
+        "# TYPE app_stage_duration_seconds histogram",
+    ]
+    with _lock:
+        for stage, h in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, count in zip([str(b) for b in h.buckets] + ["+Inf"], h.counts):
+                cumulative += count
+                lines.append(f'app_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'app_stage_duration_seconds_sum{{stage="{stage}"}} {h.sum:.6f}')
+            lines.append(f'app_stage_duration_seconds_count{{stage="{stage}"}} {h.count}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_json(path=METRICS_JSON_PATH):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"written": time.time(), "stages": snapshot()}, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+_exporters_started = False
+
+
+def start_exporters():
+    """Start the metrics endpoint and JSON writer configured by env vars, once per process"""
+    global _exporters_started
+    with _lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+    if METRICS_PORT:
+        try:
+            server = ThreadingHTTPServer(("0.0.0.0", METRICS_PORT), _MetricsHandler)
+        except OSError as e:
+            logger.warning("Metrics endpoint not started on port %d: %s", METRICS_PORT, e)
+        else:
+            threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+            logger.info("Serving stage metrics on :%d/metrics", METRICS_PORT)
+
+    if METRICS_JSON_PATH:
+        def loop():
+            while True:
+                time.sleep(METRICS_JSON_INTERVAL)
+                try:
+                    write_json()
+                except OSError as e:
+                    logger.warning("Could not write metrics to %s: %s", METRICS_JSON_PATH, e)
+        threading.Thread(target=loop, daemon=True, name="metrics-json").start()
@@ -0,0 +1,139 @@
+# tts.py
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from audio_bundle import get_audio_bundle
+from tts_cache import clip_key, get_tts_cache
+
+# "gtts" calls Google Translate's TTS endpoint; "fake" returns silent MP3 audio offline
+TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts")
+# Seconds the fake backend spends per call, plus per word, to stand in for network synthesis
+FAKE_TTS_LATENCY = float(os.getenv("FAKE_TTS_LATENCY", "0.15"))
+FAKE_TTS_LATENCY_PER_WORD = float(os.getenv("FAKE_TTS_LATENCY_PER_WORD", "0.005"))
+# Segments synthesized at once across every session in the process
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "4"))
+# Sentences are packed into segments of up to this many characters; the first is kept short
+TTS_SEGMENT_CHARS = int(os.getenv("TTS_SEGMENT_CHARS", "250"))
+
+# Sentence ends in English and Sinhala: . ? ! plus the danda and kunddaliya, followed by
+# whitespace so decimals like 6.02 stay whole, or a line break
+SENTENCE_BREAK = re.compile(r"(?<=[.!?\u0964\u0DF4])\s+|\s*\n+\s*")
+
+# One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz, about 26 ms of audio)
+_SILENT_FRAME = bytes.fromhex("fffb9064") + bytes(413)
+_FRAMES_PER_WORD = 12
+_MAX_FAKE_FRAMES = 2000
+
+
+def fake_mp3(text):
+    """Silent MP3 roughly as long as the text would take to read aloud"""
+    frames = min(_MAX_FAKE_FRAMES, max(1, len(text.split()) * _FRAMES_PER_WORD))
+    return _SILENT_FRAME * frames
+
+
+def synthesize(text, language="si", cache=True):
+    """Return MP3 bytes for text spoken in the given language.
+
+    Fixed prompts and element descriptions come from the prebuilt audio
+    bundle (see audio_bundle). Other text is looked up in the shared TTS
+    cache, so it is only synthesized once per process and disk;
+    ``cache=False`` skips the TTS cache but not the bundle.
+    """
+    audio = get_audio_bundle().get(clip_key(text, language, TTS_BACKEND))
+    if audio is not None:
+        return audio
+    if cache:
+        return get_tts_cache().get_or_synthesize(text, language, synthesize_live, voice=TTS_BACKEND)
+    return synthesize_live(text, language)
+
+
+def synthesize_clip(text, language="si"):
+    """Make text available as a clip and return its ID, for serving by URL (see load_clip)"""
+    key = clip_key(text, language, TTS_BACKEND)
+    if not get_audio_bundle().has(key):
+        get_tts_cache().get_or_synthesize(text, language, synthesize_live, voice=TTS_BACKEND)
+    return key
+
+
+def load_clip(clip_id):
+    """MP3 bytes of a clip returned by synthesize_clip, or None once it is no longer cached"""
+    audio = get_audio_bundle().load(clip_id)
+    if audio is None:
+        audio = get_tts_cache().load(clip_id)
+    return audio
+
+
+def synthesize_live(text, language):
+    """Synthesize text with the configured backend, bypassing the cache and the audio bundle"""
+    if TTS_BACKEND == "fake":
+        time.sleep(FAKE_TTS_LATENCY + FAKE_TTS_LATENCY_PER_WORD * len(text.split()))
+        return fake_mp3(text)
+
+    from gtts import gTTS
+
+    fp = BytesIO()
+    gTTS(text=text, lang=language).write_to_fp(fp)
+    return fp.getvalue()
+
+
+def split_sentences(text, max_chars=TTS_SEGMENT_CHARS):
+    """Split text into speakable segments at sentence boundaries.
+
+    The first sentence is its own segment so playback can start as soon as
+    possible; the rest are packed together up to ``max_chars`` to keep the
+    number of synthesis calls down.
+    """
+    sentences = [s.strip() for s in SENTENCE_BREAK.split(text) if s and s.strip()]
+    if not sentences:
+        return []
+    segments = [sentences[0]]
+    current = ""
+    for sentence in sentences[1:]:
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            segments.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        segments.append(current)
+    return segments
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts")
+        return _pool
+
+
+def synthesize_segments(text, language="si", synthesize_fn=synthesize):
+    """Yield MP3 bytes for each sentence segment of text, in order.
+
+    All segments are synthesized concurrently on a bounded shared pool; the
+    first is yielded as soon as it is ready, so playback can start while the
+    rest are still being synthesized. ``synthesize_fn(text, language)`` can
+    be swapped for a fake in benchmarks.
+    """
+    segments = split_sentences(text)
+    if len(segments) <= 1:
+        if segments:
+            yield synthesize_fn(segments[0], language)
+        return
+
+    futures = [_get_pool().submit(synthesize_fn, segment, language) for segment in segments]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        # The listener moved on; don't spend the pool on segments nobody will hear
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,200 @@
+# tts_cache.py
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.getenv("TTS_CACHE_PATH", os.path.join(".cache", "tts.sqlite3"))
+# Total MP3 bytes kept on disk before least recently used clips are evicted
+MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", "256")) * 1024 * 1024
+# MP3 bytes kept in memory for prompts and element descriptions that are spoken over and over
+HOT_BYTES = int(os.getenv("TTS_CACHE_HOT_MB", "16")) * 1024 * 1024
+
+
+def normalize_text(text):
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def clip_key(text, language, voice="gtts"):
+    """Content address of a clip: the same text, language and voice always give the same audio"""
+    raw = "\x1f".join([voice, language, normalize_text(text)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """MP3 clips keyed by (text hash, language), on disk with an in-memory hot tier.
+
+    The disk tier is a SQLite table capped at ``max_bytes``; past the cap
+    the least recently used clips are evicted down to 90%. The hot tier is an
+    LRU of up to ``hot_bytes`` in front of it. Each clip remembers how long
+    it took to synthesize, so hits can report the synthesis time they saved.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES, hot_bytes=HOT_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hot_bytes = hot_bytes
+        self._lock = threading.Lock()
+        self._hot = OrderedDict()
+        self._hot_size = 0
+        # One lock per clip being synthesized, so concurrent misses for the same text synthesize it once
+        self._pending = {}
+        self._stats = {"hot_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0,
+                       "saved_ms": 0.0, "synth_ms": 0.0}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS clips (
+                key TEXT PRIMARY KEY,
+                language TEXT NOT NULL,
+                audio BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                synth_ms REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_clips_last_used ON clips (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM clips").fetchone()[0]
+
+    def _remember(self, key, audio, synth_ms):
+        """Put a clip in the hot tier, dropping the coldest ones past the memory cap"""
+        if len(audio) > self.hot_bytes:
+            return
+        if key in self._hot:
+            self._hot.move_to_end(key)
+            return
+        self._hot[key] = (audio, synth_ms)
+        self._hot_size += len(audio)
+        while self._hot_size > self.hot_bytes:
+            _, (old, _) = self._hot.popitem(last=False)
+            self._hot_size -= len(old)
+
+    def _load(self, key):
+        """Return (audio, synth_ms, tier) for a cached clip, or None; call with the lock held"""
+        if key in self._hot:
+            self._hot.move_to_end(key)
+            audio, synth_ms = self._hot[key]
+            return audio, synth_ms, "hot"
+        row = self._conn.execute("SELECT audio, synth_ms FROM clips WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE clips SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        audio, synth_ms = row
+        self._remember(key, audio, synth_ms)
+        return audio, synth_ms, "disk"
+
+    def get(self, key):
+        """Return cached MP3 bytes, or None on a miss"""
+        with self._lock:
+            found = self._load(key)
+            if found is None:
+                return None
+            audio, synth_ms, tier = found
+            self._stats[f"{tier}_hits"] += 1
+            self._stats["saved_ms"] += synth_ms
+            return audio
+
+    def load(self, key):
+        """Return the clip with this key without counting a lookup, e.g. when serving it by ID"""
+        with self._lock:
+            found = self._load(key)
+        return found[0] if found else None
+
+    def put(self, key, language, audio, synth_ms):
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute(
+                "INSERT OR IGNORE INTO clips (key, language, audio, size, synth_ms, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, language, audio, len(audio), synth_ms, time.time()),
+            )
+            if self._conn.total_changes > before:
+                self._size += len(audio)
+            if self._size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+            self._remember(key, audio, synth_ms)
+
+    def _evict(self):
+        """Drop least recently used clips until the disk tier is at 90% of the cap"""
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        rows = self._conn.execute("SELECT key, size FROM clips ORDER BY last_used ASC").fetchall()
+        for key, size in rows:
+            if self._size <= target:
+                break
+            self._conn.execute("DELETE FROM clips WHERE key = ?", (key,))
+            self._size -= size
+            evicted += 1
+        self._stats["evictions"] += evicted
+        logger.info("Evicted %d TTS clips from %s", evicted, self.path)
+
+    def get_or_synthesize(self, text, language, synthesize_fn, voice="gtts"):
+        """Return MP3 bytes for text, calling synthesize_fn(text, language) only on a miss"""
+        key = clip_key(text, language, voice)
+        audio = self.get(key)
+        if audio is not None:
+            return audio
+
+        with self._lock:
+            pending = self._pending.setdefault(key, threading.Lock())
+        try:
+            with pending:
+                # Another session may have synthesized it while we waited
+                audio = self.get(key)
+                if audio is not None:
+                    return audio
+                started = time.perf_counter()
+                audio = synthesize_fn(text, language)
+                synth_ms = (time.perf_counter() - started) * 1000
+                self.put(key, language, audio, synth_ms)
+                with self._lock:
+                    self._stats["misses"] += 1
+                    self._stats["synth_ms"] += synth_ms
+                return audio
+        finally:
+            with self._lock:
+                if self._pending.get(key) is pending:
+                    del self._pending[key]
+
+    def stats(self):
+        """Return hit counts per tier, the hit rate and the synthesis time saved"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["disk_bytes"] = self._size
+            stats["hot_bytes"] = self._hot_size
+            stats["hot_entries"] = len(self._hot)
+        hits = stats["hot_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hits"] = hits
+        stats["hit_rate"] = hits / lookups if lookups else None
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache():
+    """Return the TTS cache shared by every session in this process"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TTSCache()
+        return _cache
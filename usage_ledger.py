@@ -0,0 +1,160 @@
+# usage_ledger.py
+import contextvars
+import csv
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LEDGER_PATH = os.getenv("USAGE_LEDGER_PATH", os.path.join(".cache", "usage.sqlite3"))
+# Tokens one session may spend; 0 means unlimited
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "0"))
+# Estimated US dollars the whole process may spend per UTC day; 0 means unlimited
+DAILY_COST_BUDGET = float(os.getenv("DAILY_COST_BUDGET", "0"))
+
+# US dollars per million (input, output) tokens; override with LLM_PRICES='{"model": [in, out]}'
+PRICES = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+}
+PRICES.update({model: tuple(price) for model, price in json.loads(os.getenv("LLM_PRICES", "{}")).items()})
+DEFAULT_PRICE = PRICES["gemini-2.5-flash"]
+
+_session = contextvars.ContextVar("usage_session", default="-")
+
+
+class BudgetExceeded(RuntimeError):
+    """Raised before an LLM call that would go over a session or daily budget"""
+
+
+def set_session(session_id):
+    """Tag LLM calls made from this context (one Streamlit rerun) with a session"""
+    _session.set(session_id)
+
+
+def current_session():
+    return _session.get()
+
+
+def estimate_cost(model, prompt_tokens, output_tokens):
+    input_price, output_price = PRICES.get(model, DEFAULT_PRICE)
+    return (prompt_tokens * input_price + output_tokens * output_price) / 1e6
+
+
+def _today():
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+class UsageLedger:
+    """Every LLM call with its tokens and estimated cost, by feature and session"""
+
+    def __init__(self, path=LEDGER_PATH, session_budget=SESSION_TOKEN_BUDGET, daily_budget=DAILY_COST_BUDGET):
+        self.path = path
+        self.session_budget = session_budget
+        self.daily_budget = daily_budget
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS calls (
+                ts REAL NOT NULL,
+                day TEXT NOT NULL,
+                session TEXT NOT NULL,
+                request_id TEXT NOT NULL,
+                feature TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                cost REAL NOT NULL,
+                latency_ms REAL NOT NULL,
+                error TEXT
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_calls_session ON calls (session)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_calls_day ON calls (day)")
+        self._conn.commit()
+
+    def record(self, result, session, request_id="-"):
+        """Store one LLMResult and return its estimated cost"""
+        cost = estimate_cost(result.model, result.prompt_tokens, result.output_tokens)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), _today(), session, request_id, result.feature, result.model,
+                 result.prompt_tokens, result.output_tokens, cost, result.latency_ms, result.error),
+            )
+            self._conn.commit()
+        return cost
+
+    def check_budget(self, session):
+        """Raise BudgetExceeded if the session or today's spending is over budget"""
+        if self.session_budget:
+            with self._lock:
+                used = self._conn.execute(
+                    "SELECT COALESCE(SUM(prompt_tokens + output_tokens), 0) FROM calls WHERE session = ?",
+                    (session,),
+                ).fetchone()[0]
+            if used >= self.session_budget:
+                raise BudgetExceeded(f"Session {session} used {used} of {self.session_budget} tokens")
+        if self.daily_budget:
+            with self._lock:
+                spent = self._conn.execute(
+                    "SELECT COALESCE(SUM(cost), 0) FROM calls WHERE day = ?", (_today(),)
+                ).fetchone()[0]
+            if spent >= self.daily_budget:
+                raise BudgetExceeded(f"Spent ${spent:.2f} of the ${self.daily_budget:.2f} daily budget")
+
+    def totals(self, group_by="feature", day=None):
+        """Calls, tokens and cost grouped by "feature", "session", "model" or "day" """
+        if group_by not in ("feature", "session", "model", "day"):
+            raise ValueError(f"Cannot group usage by {group_by}")
+        where, params = ("WHERE day = ?", (day,)) if day else ("", ())
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {group_by}, COUNT(*), SUM(prompt_tokens), SUM(output_tokens), SUM(cost), "
+                f"SUM(error IS NOT NULL) FROM calls {where} GROUP BY {group_by} ORDER BY SUM(cost) DESC",
+                params,
+            ).fetchall()
+        return [
+            {group_by: key, "calls": calls, "prompt_tokens": prompt, "output_tokens": output,
+             "cost_usd": round(cost, 6), "errors": errors}
+            for key, calls, prompt, output, cost, errors in rows
+        ]
+
+    def export_csv(self, day=None):
+        """All recorded calls, optionally for one day, as CSV text"""
+        where, params = ("WHERE day = ?", (day,)) if day else ("", ())
+        with self._lock:
+            cursor = self._conn.execute(f"SELECT * FROM calls {where} ORDER BY ts", params)
+            rows = cursor.fetchall()
+            columns = [c[0] for c in cursor.description]
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        writer.writerows(rows)
+        return out.getvalue()
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_usage_ledger():
+    """Return the usage ledger shared by every session in this process"""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = UsageLedger()
+        return _ledger
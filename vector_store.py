@@ -0,0 +1,463 @@
+# vector_store.py
+import logging
+import os
+import pickle
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from lexical_index import get_lexical_index, is_confident
+import tracing
+
+logger = logging.getLogger(__name__)
+
+INDEX_ROOT = "faiss_index"
+DEFAULT_NAMESPACE = "shared"
+MAX_RESIDENT_INDEXES = int(os.getenv("MAX_RESIDENT_INDEXES", "8"))
+# Heap budget for memory-mapped indexes: their docstores, plus the vectors of flat indexes,
+# which FAISS always reads into memory
+MAX_MAPPED_MB = float(os.getenv("MAX_MAPPED_MB", "512"))
+# Session namespaces not re-indexed for this long are deleted from disk; 0 keeps them forever
+NAMESPACE_TTL = float(os.getenv("INDEX_NAMESPACE_TTL", str(7 * 24 * 3600)))
+SESSION_PREFIX = "session-"
+PRUNE_INTERVAL = 3600
+# "vector", "hybrid" or "lexical_first"; see IndexRegistry.hybrid_search
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Candidates fetched from each retriever per requested result, and the RRF damping constant
+FUSION_DEPTH = 2
+RRF_K = 60
+EMBEDDING_MODEL = "models/embedding-001"
+# "google" for Gemini embeddings, "fake" for the local deterministic backend
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "google")
+VERSION_FILE = "VERSION"
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+
+def index_dir_for(namespace):
+    """Return the index directory for a user, class or document-set namespace"""
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", namespace.strip())[:64] or DEFAULT_NAMESPACE
+    return os.path.join(INDEX_ROOT, safe)
+
+
+INDEX_DIR = index_dir_for(DEFAULT_NAMESPACE)
+
+
+def migrate_legacy_index():
+    """Move an index saved before namespaces existed (directly in INDEX_ROOT) into the shared namespace"""
+    if not os.path.exists(os.path.join(INDEX_ROOT, "index.faiss")):
+        return False
+    if read_index_version(INDEX_DIR) is not None:
+        logger.warning("Ignoring the legacy index in %s because %s already has one", INDEX_ROOT, INDEX_DIR)
+        return False
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    for name in os.listdir(INDEX_ROOT):
+        path = os.path.join(INDEX_ROOT, name)
+        if os.path.isfile(path):
+            os.replace(path, os.path.join(INDEX_DIR, name))
+    logger.info("Moved the index in %s, saved before per-session namespaces, to %s", INDEX_ROOT, INDEX_DIR)
+    return True
+
+
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+
+def prune_namespaces(ttl=NAMESPACE_TTL):
+    """Delete session indexes untouched for ``ttl`` seconds; runs at most once per PRUNE_INTERVAL.
+
+    Class and shared namespaces are kept, and so is any index the registry
+    still holds. Returns the removed directories.
+    """
+    global _last_prune
+    with _prune_lock:
+        now = time.time()
+        if not ttl or now - _last_prune < PRUNE_INTERVAL or not os.path.isdir(INDEX_ROOT):
+            return []
+        _last_prune = now
+
+    removed = []
+    for entry in os.scandir(INDEX_ROOT):
+        if not (entry.is_dir() and entry.name.startswith(SESSION_PREFIX)) or registry.holds(entry.path):
+            continue
+        touched = max((f.stat().st_mtime for f in os.scandir(entry.path)), default=entry.stat().st_mtime)
+        if now - touched > ttl:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            registry.forget(entry.path)
+            removed.append(entry.path)
+    if removed:
+        logger.info("Removed %d session indexes unused for %.0f days", len(removed), ttl / 86400)
+    return removed
+
+
+def get_embeddings():
+    """Return the cached embeddings client shared by every session in this process"""
+    global _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            # LangChain is imported on first use so app start-up does not pay for it
+            from embedding_cache import CachedEmbeddings, get_embedding_store
+
+            if EMBEDDING_BACKEND == "fake":
+                from embedding_pipeline import FakeEmbeddings
+
+                backend = FakeEmbeddings()
+            else:
+                from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+                backend = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
+            _embeddings = CachedEmbeddings(
+                backend,
+                f"fake-{EMBEDDING_MODEL}" if EMBEDDING_BACKEND == "fake" else EMBEDDING_MODEL,
+                get_embedding_store(),
+            )
+        return _embeddings
+
+
+def read_index_version(index_dir=INDEX_DIR):
+    """Return the version stamp of an index on disk, or None if it does not exist"""
+    version_path = os.path.join(index_dir, VERSION_FILE)
+    try:
+        with open(version_path, "r") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+
+    # Indexes written before version stamps existed fall back to the file mtime
+    faiss_path = os.path.join(index_dir, "index.faiss")
+    if os.path.exists(faiss_path):
+        return f"mtime-{os.path.getmtime(faiss_path)}"
+    return None
+
+
+def write_index_version(index_dir=INDEX_DIR):
+    """Stamp an index directory with a new version and return it"""
+    version = str(time.time_ns())
+    tmp_path = os.path.join(index_dir, VERSION_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(index_dir, VERSION_FILE))
+    return version
+
+
+def load_index(index_dir, mmap=False):
+    """Load a saved LangChain FAISS index, optionally memory-mapping the vectors.
+
+    Memory-mapped indexes leave the vectors in the OS page cache instead of
+    the Python heap. FAISS builds that cannot map an index type fall back to
+    a normal read.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    if not mmap:
+        return FAISS.load_local(index_dir, get_embeddings(), allow_dangerous_deserialization=True)
+
+    with open(os.path.join(index_dir, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(get_embeddings(), _read_vectors(index_dir, mmap=True), docstore, index_to_docstore_id)
+
+
+def _read_vectors(index_dir, mmap):
+    import faiss
+
+    index_path = os.path.join(index_dir, "index.faiss")
+    if mmap:
+        try:
+            return faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            pass
+    return faiss.read_index(index_path)
+
+
+def _is_flat(store):
+    import faiss
+
+    # Flat indexes ignore IO_FLAG_MMAP, so mapping or unmapping them changes nothing
+    return isinstance(store.index, faiss.IndexFlat)
+
+
+def remap_index(store, index_dir, mmap):
+    """Switch a loaded index's vectors between memory-mapped and in-memory, keeping its docstore"""
+    if not _is_flat(store):
+        store.index = _read_vectors(index_dir, mmap)
+    return store
+
+
+def mapped_bytes(store, index_dir):
+    """Estimate the heap a memory-mapped index holds: its docstore, plus its vectors if flat"""
+    files = ["index.pkl", "index.faiss"] if _is_flat(store) else ["index.pkl"]
+    try:
+        return sum(os.path.getsize(os.path.join(index_dir, name)) for name in files)
+    except OSError:
+        return 0
+
+
+def _documents(store, chunk_ids, keep_missing=False):
+    """Look up chunk ids in a store's docstore"""
+    docs = []
+    for chunk_id in chunk_ids:
+        doc = store.docstore.search(chunk_id)
+        # InMemoryDocstore returns an error string for unknown ids
+        if isinstance(doc, str):
+            doc = None
+        if doc is not None or keep_missing:
+            docs.append(doc)
+    return docs
+
+
+class IndexRegistry:
+    """Process-wide cache of loaded FAISS indexes.
+
+    Streamlit re-executes app.py on every rerun, but imported modules stay
+    loaded, so one registry is shared by all sessions. An index is read from
+    disk once and only reloaded when its version stamp changes.
+
+    Indexes live in two LRU tiers. An index seen for the first time is opened
+    memory-mapped; if it is used again while still mapped it is promoted to
+    the resident tier by reading its vectors into memory. The least recently
+    used resident index is demoted back to mapped vectors. A mapped index
+    still keeps its docstore on the heap (and all of its vectors, if flat), so
+    that tier is bounded by an estimate of those bytes rather than a count.
+    """
+
+    def __init__(self, max_resident=MAX_RESIDENT_INDEXES, max_mapped_mb=MAX_MAPPED_MB):
+        self.max_resident = max_resident
+        self.max_mapped_bytes = max_mapped_mb * 1024 * 1024
+        self._mapped_bytes = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._resident = OrderedDict()
+        self._mapped = OrderedDict()
+        self._stats = {
+            "loads": 0,
+            "load_seconds": 0.0,
+            "last_load_ms": None,
+            "hits": 0,
+            "promotions": 0,
+            "evictions": 0,
+            "searches": 0,
+            "search_seconds": 0.0,
+            "last_search_ms": None,
+            "lexical_searches": 0,
+            "lexical_seconds": 0.0,
+            "lexical_only": 0,
+        }
+
+    def _lookup(self, index_dir, version):
+        """Return (tier, store) for a current cached index, or (None, None)"""
+        for tier in (self._resident, self._mapped):
+            cached = tier.get(index_dir)
+            if cached and cached[0] == version:
+                tier.move_to_end(index_dir)
+                return tier, cached[1]
+        return None, None
+
+    def _insert(self, tier, index_dir, version, store):
+        """Add an index to a tier and return the (index_dir, version) of residents pushed out of it.
+
+        The caller demotes those with _demote once it has released the lock.
+        """
+        self._resident.pop(index_dir, None)
+        self._mapped.pop(index_dir, None)
+        self._mapped_bytes.pop(index_dir, None)
+        tier[index_dir] = (version, store)
+        if tier is self._mapped:
+            self._mapped_bytes[index_dir] = mapped_bytes(store, index_dir)
+            self._trim_mapped()
+
+        demoted = []
+        while len(self._resident) > self.max_resident:
+            victim, (victim_version, victim_store) = self._resident.popitem(last=False)
+            demoted.append((victim, victim_version, victim_store))
+            self._stats["evictions"] += 1
+        return demoted
+
+    def _trim_mapped(self):
+        # The most recent entry stays even when it alone is over budget, so its next use can promote it
+        while len(self._mapped) > 1 and sum(self._mapped_bytes.values()) > self.max_mapped_bytes:
+            victim, _ = self._mapped.popitem(last=False)
+            self._mapped_bytes.pop(victim, None)
+            self._stats["evictions"] += 1
+
+    def _demote(self, demoted):
+        """Map the vectors of demoted residents, so their next use is a promotion rather than a cold load"""
+        for index_dir, version, store in demoted:
+            if read_index_version(index_dir) != version:
+                continue
+            try:
+                remap_index(store, index_dir, mmap=True)
+            except Exception as e:
+                logger.warning("Could not map demoted index %s: %s", index_dir, e)
+                continue
+            with self._lock:
+                if index_dir not in self._resident and index_dir not in self._mapped:
+                    self._mapped[index_dir] = (version, store)
+                    self._mapped_bytes[index_dir] = mapped_bytes(store, index_dir)
+                    self._trim_mapped()
+
+    def _timed_load(self, index_dir, version, mmap):
+        start = time.perf_counter()
+        store = load_index(index_dir, mmap=mmap)
+        elapsed = time.perf_counter() - start
+        tracing.observe("retrieval.load", elapsed)
+        with self._lock:
+            self._stats["loads"] += 1
+            self._stats["load_seconds"] += elapsed
+            self._stats["last_load_ms"] = elapsed * 1000
+        logger.info("Loaded index %s (version %s, %s) in %.1f ms", index_dir, version,
+                    "mmap" if mmap else "resident", elapsed * 1000)
+        return store
+
+    def get(self, index_dir=INDEX_DIR):
+        """Return the loaded index for a directory, loading it if it changed on disk"""
+        version = read_index_version(index_dir)
+        if version is None:
+            raise FileNotFoundError(
+                f"No vector index found in '{index_dir}'. Please process documents first."
+            )
+
+        with self._lock:
+            tier, store = self._lookup(index_dir, version)
+            if tier is self._resident:
+                self._stats["hits"] += 1
+                return store
+            load_lock = self._load_locks.setdefault(index_dir, threading.Lock())
+
+        # Load outside the registry lock so other namespaces are not blocked
+        with load_lock:
+            with self._lock:
+                tier, store = self._lookup(index_dir, version)
+                if tier is self._resident:
+                    self._stats["hits"] += 1
+                    return store
+                promote = tier is self._mapped
+
+            if promote:
+                # The mapped store already holds the docstore; only the vectors need reading in
+                remap_index(store, index_dir, mmap=False)
+            else:
+                store = self._timed_load(index_dir, version, mmap=True)
+
+            with self._lock:
+                if promote:
+                    self._stats["promotions"] += 1
+                demoted = self._insert(self._resident if promote else self._mapped,
+                                       index_dir, version, store)
+        self._demote(demoted)
+        return store
+
+    def save(self, store, index_dir=INDEX_DIR):
+        """Persist an index, publish a new version and keep it resident"""
+        store.save_local(index_dir)
+        version = write_index_version(index_dir)
+        with self._lock:
+            demoted = self._insert(self._resident, index_dir, version, store)
+        self._demote(demoted)
+        return version
+
+    def holds(self, index_dir):
+        """Whether an index directory is loaded in either tier"""
+        with self._lock:
+            return index_dir in self._resident or index_dir in self._mapped
+
+    def forget(self, index_dir):
+        """Drop an index directory that was deleted from disk"""
+        with self._lock:
+            self._resident.pop(index_dir, None)
+            self._mapped.pop(index_dir, None)
+            self._mapped_bytes.pop(index_dir, None)
+            self._load_locks.pop(index_dir, None)
+
+    def similarity_search(self, query, k=4, index_dir=INDEX_DIR):
+        """Search a cached index and record the search latency"""
+        return self._vector_search(self.get(index_dir), query, k, index_dir)
+
+    def _vector_search(self, store, query, k, index_dir):
+        with tracing.span("retrieval.embed"):
+            vector = get_embeddings().embed_query(query)
+        start = time.perf_counter()
+        docs = store.similarity_search_by_vector(vector, k=k)
+        elapsed = time.perf_counter() - start
+        tracing.observe("retrieval.faiss", elapsed)
+
+        with self._lock:
+            self._stats["searches"] += 1
+            self._stats["search_seconds"] += elapsed
+            self._stats["last_search_ms"] = elapsed * 1000
+        logger.info("Searched %s in %.1f ms", index_dir, elapsed * 1000)
+        return docs
+
+    def hybrid_search(self, query, k=4, index_dir=INDEX_DIR, mode=RETRIEVAL_MODE):
+        """Retrieve chunks by fusing BM25 and vector results.
+
+        ``mode`` is "vector" (FAISS only), "hybrid" (reciprocal rank fusion of
+        BM25 and FAISS) or "lexical_first" (hybrid, except that a confident
+        BM25 match is returned straight away without embedding the query).
+        """
+        if mode == "vector":
+            return self.similarity_search(query, k=k, index_dir=index_dir)
+
+        # One lookup per query; the vector search below reuses this store
+        store = self.get(index_dir)
+        lexical = get_lexical_index(index_dir, read_index_version(index_dir))
+        if lexical is None:
+            return self._vector_search(store, query, k, index_dir)
+
+        start = time.perf_counter()
+        lexical_hits = lexical.search(query, k=k * FUSION_DEPTH)
+        elapsed = time.perf_counter() - start
+        tracing.observe("retrieval.bm25", elapsed)
+        with self._lock:
+            self._stats["lexical_searches"] += 1
+            self._stats["lexical_seconds"] += elapsed
+
+        if mode == "lexical_first" and is_confident(lexical_hits):
+            with self._lock:
+                self._stats["lexical_only"] += 1
+            return _documents(store, [chunk_id for chunk_id, _, _ in lexical_hits[:k]])
+
+        vector_docs = self._vector_search(store, query, k * FUSION_DEPTH, index_dir)
+
+        # Reciprocal rank fusion
+        fused = {}
+        docs_by_id = {}
+        for rank, doc in enumerate(vector_docs):
+            chunk_id = doc.metadata.get("chunk_id") or doc.page_content
+            docs_by_id[chunk_id] = doc
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1 / (RRF_K + rank + 1)
+        for rank, (chunk_id, _, _) in enumerate(lexical_hits):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1 / (RRF_K + rank + 1)
+
+        ranked = sorted(fused, key=fused.get, reverse=True)[:k]
+        missing = [chunk_id for chunk_id in ranked if chunk_id not in docs_by_id]
+        docs_by_id.update(zip(missing, _documents(store, missing, keep_missing=True)))
+        return [docs_by_id[chunk_id] for chunk_id in ranked if docs_by_id.get(chunk_id) is not None]
+
+    def stats(self):
+        """Return residency, load and search latency figures for display"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["resident"] = len(self._resident)
+            stats["mapped"] = len(self._mapped)
+            stats["mapped_mb"] = sum(self._mapped_bytes.values()) / (1024 * 1024)
+        stats["avg_load_ms"] = (
+            stats["load_seconds"] / stats["loads"] * 1000 if stats["loads"] else None
+        )
+        stats["avg_search_ms"] = (
+            stats["search_seconds"] / stats["searches"] * 1000 if stats["searches"] else None
+        )
+        stats["avg_lexical_ms"] = (
+            stats["lexical_seconds"] / stats["lexical_searches"] * 1000
+            if stats["lexical_searches"] else None
+        )
+        # Every cache hit is a load_local call we did not have to make
+        stats["saved_ms"] = (
+            stats["hits"] * stats["avg_load_ms"] if stats["avg_load_ms"] else 0.0
+        )
+        return stats
+
+
+registry = IndexRegistry()